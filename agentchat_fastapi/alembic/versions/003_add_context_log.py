@@ -0,0 +1,71 @@
+"""添加智能体上下文日志表
+
+Revision ID: 003
+Revises: e211a05619a6
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '003'
+down_revision: Union[str, None] = 'e211a05619a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 创建上下文消息表
+    op.create_table(
+        'chat_context_messages',
+        sa.Column('session_id', postgresql.UUID(as_uuid=True),
+                  sa.ForeignKey('chat_sessions.id', ondelete='CASCADE'),
+                  primary_key=True, comment='关联的会话ID'),
+        sa.Column('seq', sa.Integer(), primary_key=True, comment='消息在上下文中的序号，从0开始'),
+        sa.Column('message', postgresql.JSON(astext_type=sa.Text()), nullable=False,
+                  comment='序列化的LLM上下文消息'),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False,
+                  comment='创建时间'),
+        comment='智能体上下文消息表',
+    )
+
+    # 添加已追加消息数量字段
+    op.add_column('chat_sessions', sa.Column('context_length', sa.Integer(), server_default=sa.text('0'),
+                                             nullable=False, comment='已追加到上下文日志的消息数量'))
+
+    # 将已有会话状态中的上下文消息迁移到上下文消息表
+    op.execute(sa.text("""
+        INSERT INTO chat_context_messages (session_id, seq, message)
+        SELECT s.id, e.ordinality - 1, e.value
+        FROM chat_sessions s,
+             json_array_elements(s.agent_state -> 'llm_context' -> 'messages') WITH ORDINALITY AS e(value, ordinality)
+        WHERE json_typeof(s.agent_state -> 'llm_context' -> 'messages') = 'array'
+    """))
+    op.execute(sa.text("""
+        UPDATE chat_sessions s
+        SET context_length = c.cnt,
+            agent_state = jsonb_set(s.agent_state::jsonb, '{llm_context,messages}', '[]'::jsonb)::json
+        FROM (SELECT session_id, count(*) AS cnt FROM chat_context_messages GROUP BY session_id) c
+        WHERE c.session_id = s.id
+    """))
+
+
+def downgrade() -> None:
+    # 将上下文消息写回会话状态
+    op.execute(sa.text("""
+        UPDATE chat_sessions s
+        SET agent_state = jsonb_set(
+            s.agent_state::jsonb,
+            '{llm_context,messages}',
+            (SELECT jsonb_agg(c.message::jsonb ORDER BY c.seq)
+             FROM chat_context_messages c WHERE c.session_id = s.id)
+        )::json
+        WHERE s.context_length > 0
+    """))
+
+    op.drop_column('chat_sessions', 'context_length')
+    op.drop_table('chat_context_messages')
@@ -0,0 +1,36 @@
+"""添加会话消息计数字段
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '004'
+down_revision: Union[str, None] = '003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 添加消息计数字段
+    op.add_column('chat_sessions', sa.Column('message_count', sa.Integer(), server_default=sa.text('0'),
+                                             nullable=False, comment='会话消息数量，随消息写入维护'))
+
+    # 回填已有会话的消息数量
+    op.execute(sa.text("""
+        UPDATE chat_sessions s
+        SET message_count = c.cnt
+        FROM (SELECT session_id, count(*) AS cnt FROM chat_messages GROUP BY session_id) c
+        WHERE c.session_id = s.id
+    """))
+
+
+def downgrade() -> None:
+    # 删除消息计数字段
+    op.drop_column('chat_sessions', 'message_count')
@@ -0,0 +1,32 @@
+"""添加键集分页复合索引
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '005'
+down_revision: Union[str, None] = '004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 会话历史：按会话过滤并按 (created_at, id) 排序
+    op.create_index('ix_chat_messages_session_id_created_at_id', 'chat_messages',
+                    ['session_id', 'created_at', 'id'])
+    # 会话列表：按 (updated_at, id) 倒序
+    op.create_index('ix_chat_sessions_updated_at_id', 'chat_sessions',
+                    [sa.text('updated_at DESC'), sa.text('id DESC')])
+
+
+def downgrade() -> None:
+    # 删除索引
+    op.drop_index('ix_chat_sessions_updated_at_id', table_name='chat_sessions')
+    op.drop_index('ix_chat_messages_session_id_created_at_id', table_name='chat_messages')
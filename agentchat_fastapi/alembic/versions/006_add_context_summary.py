@@ -0,0 +1,31 @@
+"""添加会话历史摘要字段
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '006'
+down_revision: Union[str, None] = '005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 添加滚动摘要上下文策略使用的摘要缓存字段
+    op.add_column('chat_sessions', sa.Column('context_summary', sa.Text(), nullable=True,
+                                             comment='滚动摘要上下文策略缓存的历史摘要'))
+    op.add_column('chat_sessions', sa.Column('context_summary_count', sa.Integer(), server_default=sa.text('0'),
+                                             nullable=False, comment='已合并进历史摘要的上下文消息数量'))
+
+
+def downgrade() -> None:
+    # 删除摘要缓存字段
+    op.drop_column('chat_sessions', 'context_summary_count')
+    op.drop_column('chat_sessions', 'context_summary')
@@ -0,0 +1,287 @@
+"""
+智能体缓存 - 按会话缓存活跃的智能体实例
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Mapping, Optional
+
+from autogen_agentchat.agents import AssistantAgent
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from agentchat_fastapi.api.database import async_session_factory
+from agentchat_fastapi.api.metrics import AGENT_CACHE_REQUESTS, observe_stage
+from agentchat_fastapi.api.services import ChatSessionService, get_agent
+
+
+logger = logging.getLogger(__name__)
+
+
+# 缓存配置，可通过环境变量调整
+AGENT_CACHE_SIZE = int(os.getenv("AGENT_CACHE_SIZE", "256"))
+AGENT_CACHE_TTL = float(os.getenv("AGENT_CACHE_TTL", "1800"))
+AGENT_STATE_FLUSH_INTERVAL = float(os.getenv("AGENT_STATE_FLUSH_INTERVAL", "5"))
+
+
+@dataclass
+class _CachedAgent:
+    """缓存条目"""
+    agent: AssistantAgent
+    last_used: float
+    dirty: bool = False
+
+
+@dataclass
+class _SessionLock:
+    """带引用计数的会话锁，无人持有或等待时释放"""
+    lock: asyncio.Lock
+    refs: int = 0
+
+
+class AgentCache:
+    """活跃智能体LRU缓存
+
+    以 session_id 为键缓存已加载状态的 AssistantAgent，热会话跳过
+    load_state/save_state 的反序列化和序列化。状态采用延迟写回：
+    每轮对话只标记为脏，由后台任务按固定间隔、在淘汰时以及应用关闭时写回数据库。
+
+    同一会话的请求通过会话锁串行执行。缓存位于进程内，多工作进程部署时
+    需要按会话粘滞路由，或将 AGENT_CACHE_SIZE 设为 0 退化为每轮直接写回。
+    """
+
+    def __init__(
+        self,
+        max_size: int = AGENT_CACHE_SIZE,
+        idle_ttl: float = AGENT_CACHE_TTL,
+        flush_interval: float = AGENT_STATE_FLUSH_INTERVAL,
+    ):
+        """初始化智能体缓存
+
+        Args:
+            max_size: 最多缓存的会话数量，为0时不缓存，每轮直接写回状态
+            idle_ttl: 空闲过期时间（秒）
+            flush_interval: 后台写回间隔（秒）
+        """
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self.flush_interval = flush_interval
+        self._entries: "OrderedDict[uuid.UUID, _CachedAgent]" = OrderedDict()
+        self._locks: Dict[uuid.UUID, _SessionLock] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        """是否启用缓存"""
+        return self.max_size > 0
+
+    @asynccontextmanager
+    async def _hold(self, session_id: uuid.UUID) -> AsyncIterator[None]:
+        """持有会话锁"""
+        holder = self._locks.get(session_id)
+        if holder is None:
+            holder = self._locks[session_id] = _SessionLock(lock=asyncio.Lock())
+        holder.refs += 1
+        try:
+            async with holder.lock:
+                yield
+        finally:
+            holder.refs -= 1
+            if holder.refs == 0:
+                del self._locks[session_id]
+
+    def _busy(self, session_id: uuid.UUID) -> bool:
+        """会话是否正在被使用或有请求等待"""
+        return session_id in self._locks
+
+    @asynccontextmanager
+    async def checkout(self, session_id: uuid.UUID, db: AsyncSession) -> AsyncIterator[AssistantAgent]:
+        """在会话锁内取出会话对应的智能体
+
+        启用缓存时，正常退出后标记状态为脏等待写回；发生异常或取消时将模型上下文恢复到本轮开始前，
+        此前轮次尚未写回的状态保持原有的脏标记，本轮的半轮上下文不会写回。
+        未启用缓存时在正常退出后直接通过db写回。
+
+        调用方进入前须提交db中已有的写入：后台写回在会话锁内更新会话行，
+        持有会话行锁时等待会话锁会与其互相等待，且数据库无法检测这种死锁。
+        """
+        self._ensure_flusher()
+        async with self._hold(session_id):
+            agent = await self._get_or_load(session_id, db)
+            # 本轮开始前的上下文，失败时恢复，避免只有用户消息、没有回复的半轮上下文被写回
+            pre_turn_context = await agent.model_context.save_state() if self.enabled else None
+            try:
+                yield agent
+            except BaseException:
+                await self._restore_context(session_id, agent, pre_turn_context)
+                raise
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                entry.dirty = True
+
+            if not self.enabled:
+                await save_agent_state(db, session_id, agent)
+
+        await self._evict_overflow()
+
+    async def _restore_context(
+        self, session_id: uuid.UUID, agent: AssistantAgent, state: Optional[Mapping[str, Any]]
+    ) -> None:
+        """将缓存智能体的模型上下文恢复到本轮开始前，恢复失败时丢弃缓存条目"""
+        if state is None:
+            return
+        try:
+            await agent.model_context.load_state(state)
+        except Exception:
+            logger.exception("恢复会话 %s 上下文出错，丢弃缓存条目", session_id)
+            self._entries.pop(session_id, None)
+
+    async def _get_or_load(self, session_id: uuid.UUID, db: AsyncSession) -> AssistantAgent:
+        """从缓存获取智能体，未命中或已过期时从数据库加载，调用方须持有会话锁"""
+        now = time.monotonic()
+        entry = self._entries.get(session_id)
+        if entry is not None:
+            # 已过期但尚未写回的条目仍是最新状态，继续使用，只由后台写回和淘汰负责持久化，
+            # 不在请求路径上开启独立的数据库会话写回
+            if now - entry.last_used < self.idle_ttl or entry.dirty:
+                entry.last_used = now
+                self._entries.move_to_end(session_id)
+                AGENT_CACHE_REQUESTS.labels(result="hit").inc()
+                return entry.agent
+            # 已过期且已写回：重新加载
+            del self._entries[session_id]
+
+        AGENT_CACHE_REQUESTS.labels(result="miss").inc()
+        agent = await get_agent(session_id, db)
+        if self.enabled:
+            self._entries[session_id] = _CachedAgent(agent=agent, last_used=now)
+        return agent
+
+    async def _persist(self, session_id: uuid.UUID, entry: _CachedAgent) -> None:
+        """使用独立的数据库会话写回智能体状态"""
+        async with async_session_factory() as db:
+            await save_agent_state(db, session_id, entry.agent)
+            await db.commit()
+        entry.dirty = False
+
+    async def _evict(self, session_id: uuid.UUID) -> None:
+        """淘汰空闲的缓存条目，脏状态先写回"""
+        # 正在使用的会话不淘汰
+        if self._busy(session_id):
+            return
+        async with self._hold(session_id):
+            entry = self._entries.pop(session_id, None)
+            if entry is not None and entry.dirty:
+                try:
+                    await self._persist(session_id, entry)
+                except Exception:
+                    logger.exception("写回会话 %s 状态出错", session_id)
+
+    async def _evict_overflow(self) -> None:
+        """超过容量时按LRU顺序淘汰"""
+        overflow = len(self._entries) - self.max_size
+        if overflow <= 0:
+            return
+        for session_id in list(self._entries)[:overflow]:
+            await self._evict(session_id)
+
+    async def flush(self) -> None:
+        """写回所有脏状态并淘汰空闲过期的条目"""
+        now = time.monotonic()
+        for session_id, entry in list(self._entries.items()):
+            if now - entry.last_used >= self.idle_ttl:
+                await self._evict(session_id)
+                continue
+            if not entry.dirty:
+                continue
+            async with self._hold(session_id):
+                if self._entries.get(session_id) is entry and entry.dirty:
+                    try:
+                        await self._persist(session_id, entry)
+                    except Exception:
+                        logger.exception("写回会话 %s 状态出错", session_id)
+
+    def discard(self, session_id: uuid.UUID) -> None:
+        """丢弃会话的缓存条目（不写回），用于会话删除"""
+        self._entries.pop(session_id, None)
+
+    def _ensure_flusher(self) -> None:
+        """按需启动后台写回任务"""
+        if not self.enabled or self.flush_interval <= 0:
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        """后台写回循环"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("后台写回智能体状态出错")
+
+    async def close(self) -> None:
+        """停止后台任务并写回所有状态"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        for session_id in list(self._entries):
+            await self._evict(session_id)
+
+
+async def save_agent_state(db: AsyncSession, session_id: uuid.UUID, agent: AssistantAgent) -> None:
+    """序列化智能体状态并增量写入数据库（不提交事务）"""
+    with observe_stage("save_state"):
+        state = await agent.save_state()
+
+        # 确保状态包含必要的字段
+        if "type" not in state:
+            state["type"] = "AssistantAgentState"
+        if "version" not in state:
+            state["version"] = "1.0.0"
+        if "llm_context" not in state:
+            state["llm_context"] = {"messages": []}
+
+        await ChatSessionService.append_agent_state(db, session_id, state)
+
+
+# 进程级智能体缓存，由应用 lifespan 创建和关闭
+_agent_cache: Optional[AgentCache] = None
+
+
+def init_agent_cache() -> AgentCache:
+    """创建进程级智能体缓存"""
+    global _agent_cache
+    _agent_cache = AgentCache()
+    return _agent_cache
+
+
+def get_agent_cache() -> AgentCache:
+    """获取进程级智能体缓存，未初始化时按需创建"""
+    return _agent_cache or init_agent_cache()
+
+
+async def close_agent_cache() -> None:
+    """写回并释放进程级智能体缓存"""
+    global _agent_cache
+    if _agent_cache is not None:
+        await _agent_cache.close()
+        _agent_cache = None
+
+
+__all__ = [
+    'AgentCache',
+    'save_agent_state',
+    'init_agent_cache',
+    'get_agent_cache',
+    'close_agent_cache',
+]
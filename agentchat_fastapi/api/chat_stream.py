@@ -0,0 +1,222 @@
+"""
+流式对话 - 基于 on_messages_stream 的逐token对话轮次
+"""
+import asyncio
+import json
+import logging
+import uuid
+from typing import Any, AsyncGenerator, Dict, Tuple
+
+from autogen_agentchat.base import Response
+from autogen_agentchat.messages import ModelClientStreamingChunkEvent, TextMessage
+from autogen_core import CancellationToken
+from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+
+from agentchat_fastapi.api.agent_cache import get_agent_cache
+from agentchat_fastapi.api.database import async_session_factory
+from agentchat_fastapi.api.logging_config import request_id_var
+from agentchat_fastapi.api.metrics import observe_stage, record_usage
+from agentchat_fastapi.api.services import ChatMessageService, ChatSessionService
+
+
+logger = logging.getLogger(__name__)
+
+
+def build_chat_result(chat_message: Any) -> Dict[str, Any]:
+    """将智能体回复转换为接口返回的字典"""
+    # 手动创建响应字典，而不是调用to_dict方法
+    if hasattr(chat_message, 'to_dict'):
+        # 如果对象有to_dict方法，使用它
+        return chat_message.to_dict()
+
+    # 否则手动创建字典
+    result = {
+        "content": chat_message.content if hasattr(chat_message, 'content') else "",
+        "source": chat_message.source if hasattr(chat_message, 'source') else "assistant",
+        "type": chat_message.type if hasattr(chat_message, 'type') else "TextMessage",
+        "models_usage": chat_message.models_usage if hasattr(chat_message, 'models_usage') else None,
+        "metadata": chat_message.metadata if hasattr(chat_message, 'metadata') else {}
+    }
+    # 添加thought字段（如果存在）
+    if hasattr(chat_message, 'thought') and chat_message.thought:
+        result["thought"] = chat_message.thought
+    return result
+
+
+async def stream_chat(
+    session_id: uuid.UUID,
+    message: TextMessage,
+    cancellation_token: CancellationToken,
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """运行一轮流式对话
+
+    先保存并提交用户消息，然后逐个产出 {"event": "token", "content": ...} 事件，
+    回复完成后保存智能体回复并产出 {"event": "message", ...} 事件。
+    调用方负责确认会话存在；取消时通过 cancellation_token 中止模型调用。
+    使用独立的数据库会话，不依赖请求级的 get_db 依赖。
+    """
+    async with async_session_factory() as db:
+        # 保存用户消息
+        with observe_stage("message_insert"):
+            await ChatMessageService.create_from_text_message(db, session_id, message)
+        with observe_stage("commit"):
+            await db.commit()
+
+        final_message = None
+        try:
+            async with get_agent_cache().checkout(session_id, db) as agent:
+                # 流式耗时包含向客户端推送token的时间
+                with observe_stage("llm_call"):
+                    async for item in agent.on_messages_stream([message], cancellation_token):
+                        if isinstance(item, ModelClientStreamingChunkEvent):
+                            yield {"event": "token", "content": item.content}
+                        elif isinstance(item, Response):
+                            final_message = item.chat_message
+        except BaseException:
+            # 客户端断开或出错时中止模型调用
+            cancellation_token.cancel()
+            raise
+
+        # 保存智能体回复
+        assert isinstance(final_message, TextMessage)
+        record_usage(final_message.models_usage)
+        with observe_stage("message_insert"):
+            await ChatMessageService.create_from_text_message(db, session_id, final_message)
+        with observe_stage("commit"):
+            await db.commit()
+
+        yield {"event": "message", **build_chat_result(final_message)}
+
+
+class WebSocketChatConnection:
+    """WebSocket对话连接
+
+    一个连接可同时驱动多个会话，所有帧均为JSON并以 session_id 标记。
+
+    客户端帧：
+    - {"type": "chat", "session_id": "...", "message": {"source": "user", "content": "..."}}
+    - {"type": "cancel", "session_id": "..."}
+
+    服务端帧：token / message / done / cancelled / error，均携带 session_id；
+    message 帧的 message 字段为完整回复，内容与SSE接口相同。同一会话同时只允许一轮进行中的对话。
+    """
+
+    def __init__(self, websocket: WebSocket):
+        """初始化WebSocket对话连接
+
+        Args:
+            websocket: 已建立的WebSocket连接
+        """
+        self.websocket = websocket
+        self._turns: Dict[uuid.UUID, Tuple[asyncio.Task, CancellationToken]] = {}
+        self._send_lock = asyncio.Lock()
+
+    async def serve(self) -> None:
+        """接受连接并处理客户端帧，直到连接断开"""
+        await self.websocket.accept()
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", 1000))
+                # 二进制帧没有 text 字段，与格式错误的帧一样回复 error 帧，不断开连接
+                text = message.get("text")
+                if text is None:
+                    await self._send("error", None, {"content": "Error: 只支持文本帧"})
+                    continue
+                try:
+                    frame = json.loads(text)
+                except ValueError:
+                    await self._send("error", None, {"content": "Error: 帧格式错误"})
+                    continue
+                await self._handle_frame(frame)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            # 连接断开时取消所有进行中的对话
+            for task, cancellation_token in list(self._turns.values()):
+                cancellation_token.cancel()
+                task.cancel()
+
+    async def _send(self, frame_type: str, session_id: Any, data: Dict[str, Any]) -> None:
+        """发送一帧，多个会话的任务共享连接时串行写入"""
+        frame = {"type": frame_type, "session_id": str(session_id) if session_id else None, **data}
+        async with self._send_lock:
+            await self.websocket.send_json(jsonable_encoder(frame))
+
+    async def _handle_frame(self, frame: Any) -> None:
+        """分发客户端帧"""
+        if not isinstance(frame, dict):
+            await self._send("error", None, {"content": "Error: 帧格式错误"})
+            return
+
+        raw_session_id = frame.get("session_id")
+        try:
+            session_id = uuid.UUID(str(raw_session_id))
+        except ValueError:
+            await self._send("error", raw_session_id, {"content": "Error: 无效的session_id"})
+            return
+
+        frame_type = frame.get("type")
+        if frame_type == "chat":
+            await self._start_turn(session_id, frame.get("message") or {})
+        elif frame_type == "cancel":
+            turn = self._turns.get(session_id)
+            if turn is not None:
+                task, cancellation_token = turn
+                cancellation_token.cancel()
+                task.cancel()
+        else:
+            await self._send("error", session_id, {"content": f"Error: 未知的帧类型 {frame_type}"})
+
+    async def _start_turn(self, session_id: uuid.UUID, payload: Dict[str, Any]) -> None:
+        """启动一轮对话任务"""
+        if session_id in self._turns:
+            await self._send("error", session_id, {"content": "Error: 该会话已有进行中的对话"})
+            return
+        try:
+            message = TextMessage(source=payload.get("source", "user"), content=payload["content"])
+        except Exception:
+            await self._send("error", session_id, {"content": "Error: 消息格式错误"})
+            return
+
+        async with async_session_factory() as db:
+            session = await ChatSessionService.get_session(db, session_id)
+        if not session:
+            await self._send("error", session_id, {"content": "Error: 会话不存在"})
+            return
+
+        cancellation_token = CancellationToken()
+        task = asyncio.create_task(self._run_turn(session_id, message, cancellation_token))
+        self._turns[session_id] = (task, cancellation_token)
+        task.add_done_callback(lambda _: self._turns.pop(session_id, None))
+
+    async def _run_turn(
+        self, session_id: uuid.UUID, message: TextMessage, cancellation_token: CancellationToken
+    ) -> None:
+        """运行一轮对话并把事件推送给客户端"""
+        # 每轮对话使用独立的请求ID，任务内设置不影响连接上的其他会话
+        request_id_var.set(uuid.uuid4().hex)
+        try:
+            async for event in stream_chat(session_id, message, cancellation_token):
+                event_type = event.pop("event")
+                # 完整回复自带type字段，放在message键下避免覆盖帧类型
+                data = {"message": event} if event_type == "message" else event
+                await self._send(event_type, session_id, data)
+            await self._send("done", session_id, {})
+        except asyncio.CancelledError:
+            try:
+                await self._send("cancelled", session_id, {})
+            except Exception:
+                # 连接已断开
+                pass
+        except Exception as e:
+            logger.exception("Error in chat websocket", extra={"session_id": str(session_id)})
+            try:
+                await self._send("error", session_id, {"content": f"Error: {str(e)}"})
+            except Exception:
+                pass
+
+
+__all__ = ['build_chat_result', 'stream_chat', 'WebSocketChatConnection']
@@ -0,0 +1,148 @@
+"""
+上下文策略 - 限制每轮发送给模型的上下文长度
+"""
+import logging
+import os
+from typing import Any, List, Mapping, Optional
+
+from autogen_core.model_context import (
+    BufferedChatCompletionContext,
+    ChatCompletionContext,
+    TokenLimitedChatCompletionContext,
+    UnboundedChatCompletionContext,
+)
+from autogen_core.models import (
+    ChatCompletionClient,
+    FunctionExecutionResultMessage,
+    LLMMessage,
+    SystemMessage,
+    UserMessage,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+# 上下文策略配置，可通过环境变量调整
+# unbounded：完整上下文；last_n：最近N条；token_budget：按token预算截断；summary：滚动摘要+最近N条
+AGENT_CONTEXT_POLICY = os.getenv("AGENT_CONTEXT_POLICY", "unbounded")
+AGENT_CONTEXT_LAST_N = int(os.getenv("AGENT_CONTEXT_LAST_N", "20"))
+AGENT_CONTEXT_TOKEN_BUDGET = int(os.getenv("AGENT_CONTEXT_TOKEN_BUDGET", "8000"))
+AGENT_CONTEXT_SUMMARY_BATCH = int(os.getenv("AGENT_CONTEXT_SUMMARY_BATCH", "10"))
+
+SUMMARY_SYSTEM_MESSAGE = """你是一个对话摘要助手。根据已有摘要和新增的对话内容，输出更新后的完整摘要。
+摘要应保留用户的目标、偏好、已确认的事实和未解决的问题，省略寒暄和重复内容。
+只输出摘要本身，不要包含任何其他解释。"""
+
+
+def _format_message(message: LLMMessage) -> str:
+    """将上下文消息格式化为摘要输入中的一行"""
+    source = getattr(message, "source", None) or type(message).__name__
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return f"{source}: {content}"
+
+
+class SummarizingChatCompletionContext(ChatCompletionContext):
+    """滚动摘要上下文
+
+    保存完整的消息列表（持久化仍为追加写），但发送给模型的只有一条摘要系统消息
+    和摘要之后的最近消息。未摘要的旧消息累计达到 batch_size 条时，
+    将其与已有摘要合并生成新摘要，因此每次只摘要增量部分。
+    摘要和已摘要的消息数随状态一起保存，由服务层缓存在会话行中。
+    """
+
+    def __init__(
+        self,
+        model_client: ChatCompletionClient,
+        keep_last: int = AGENT_CONTEXT_LAST_N,
+        batch_size: int = AGENT_CONTEXT_SUMMARY_BATCH,
+        initial_messages: Optional[List[LLMMessage]] = None,
+    ):
+        """初始化滚动摘要上下文
+
+        Args:
+            model_client: 用于生成摘要的模型客户端
+            keep_last: 始终原样保留的最近消息数
+            batch_size: 触发一次增量摘要所需的未摘要旧消息数
+            initial_messages: 初始消息
+        """
+        super().__init__(initial_messages)
+        self._model_client = model_client
+        self._keep_last = keep_last
+        self._batch_size = max(batch_size, 1)
+        self._summary: Optional[str] = None
+        self._summarized_count = 0
+
+    async def get_messages(self) -> List[LLMMessage]:
+        """返回摘要和摘要之后的最近消息"""
+        summarize_end = len(self._messages) - self._keep_last
+        window_start = self._summarized_count
+        if summarize_end - self._summarized_count >= self._batch_size:
+            try:
+                await self._update_summary(summarize_end)
+                window_start = self._summarized_count
+            except Exception as e:
+                # 摘要失败时只发送最近消息，保证上下文长度仍有上限
+                logger.warning("生成上下文摘要失败: %s", e)
+                window_start = summarize_end
+
+        messages = list(self._messages[window_start:])
+        # 窗口起点不能是缺少对应调用的函数执行结果
+        while messages and isinstance(messages[0], FunctionExecutionResultMessage):
+            messages.pop(0)
+        if self._summary:
+            messages.insert(0, SystemMessage(content=f"此前对话的摘要：\n{self._summary}"))
+        return messages
+
+    async def _update_summary(self, end: int) -> None:
+        """将 [已摘要位置, end) 之间的消息合并进摘要"""
+        new_lines = "\n".join(_format_message(m) for m in self._messages[self._summarized_count:end])
+        prompt = f"已有摘要：\n{self._summary or '无'}\n\n新增对话：\n{new_lines}\n\n请输出更新后的完整摘要。"
+        result = await self._model_client.create(
+            [SystemMessage(content=SUMMARY_SYSTEM_MESSAGE), UserMessage(content=prompt, source="user")]
+        )
+        if not isinstance(result.content, str):
+            raise ValueError("摘要结果不是文本")
+        self._summary = result.content.strip()
+        self._summarized_count = end
+
+    async def clear(self) -> None:
+        """清空上下文和摘要"""
+        await super().clear()
+        self._summary = None
+        self._summarized_count = 0
+
+    async def save_state(self) -> Mapping[str, Any]:
+        """保存消息、摘要和已摘要的消息数"""
+        state = dict(await super().save_state())
+        state["summary"] = self._summary
+        state["summarized_count"] = self._summarized_count
+        return state
+
+    async def load_state(self, state: Mapping[str, Any]) -> None:
+        """加载消息、摘要和已摘要的消息数"""
+        await super().load_state(state)
+        self._summary = state.get("summary")
+        self._summarized_count = min(state.get("summarized_count") or 0, len(self._messages))
+
+
+def create_model_context(
+    model_client: ChatCompletionClient, policy: Optional[str] = None
+) -> ChatCompletionContext:
+    """按配置的上下文策略创建模型上下文"""
+    policy = policy or AGENT_CONTEXT_POLICY
+    if policy == "last_n":
+        return BufferedChatCompletionContext(buffer_size=AGENT_CONTEXT_LAST_N)
+    if policy == "token_budget":
+        return TokenLimitedChatCompletionContext(model_client, token_limit=AGENT_CONTEXT_TOKEN_BUDGET)
+    if policy == "summary":
+        return SummarizingChatCompletionContext(model_client)
+    if policy != "unbounded":
+        logger.warning("未知的上下文策略 %s，使用完整上下文", policy)
+    return UnboundedChatCompletionContext()
+
+
+__all__ = [
+    'SummarizingChatCompletionContext',
+    'create_model_context',
+]
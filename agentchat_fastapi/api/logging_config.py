@@ -0,0 +1,114 @@
+"""
+日志配置 - 结构化日志、按模块级别、调试日志采样和请求ID
+"""
+import json
+import logging
+import os
+import random
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+
+# 当前请求ID，由HTTP中间件或WebSocket对话任务设置
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+# LogRecord 的标准属性，其余属性视为结构化字段输出
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+
+class RequestIdFilter(logging.Filter):
+    """为日志记录附加当前请求ID"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    """按比例采样DEBUG及以下级别的日志，其他级别全部保留"""
+
+    def __init__(self, sample_rate: float = 1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.sample_rate >= 1.0:
+            return True
+        return random.random() < self.sample_rate
+
+
+class JsonFormatter(logging.Formatter):
+    """单行JSON日志格式，extra 参数中的字段作为独立键输出"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    """解析 "模块=级别,模块=级别" 形式的按模块日志级别"""
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(
+    level: Optional[str] = None,
+    module_levels: Optional[str] = None,
+    debug_sample_rate: Optional[float] = None,
+    log_format: Optional[str] = None,
+) -> None:
+    """配置应用日志，未传入的参数从环境变量读取
+
+    Args:
+        level: 根日志级别，默认读取 LOG_LEVEL，缺省为 INFO
+        module_levels: 按模块的日志级别，如 "agentchat_fastapi.api.routes=DEBUG"，默认读取 LOG_LEVELS
+        debug_sample_rate: DEBUG 日志采样比例（0~1），默认读取 LOG_DEBUG_SAMPLE_RATE，缺省为 1
+        log_format: json 或 text，默认读取 LOG_FORMAT，缺省为 json
+    """
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    module_levels = module_levels if module_levels is not None else os.getenv("LOG_LEVELS", "")
+    if debug_sample_rate is None:
+        debug_sample_rate = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1"))
+    log_format = (log_format or os.getenv("LOG_FORMAT", "json")).lower()
+
+    handler = logging.StreamHandler(sys.stdout)
+    handler.addFilter(RequestIdFilter())
+    handler.addFilter(DebugSamplingFilter(debug_sample_rate))
+    if log_format == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(
+            "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+        ))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
+    for name, module_level in _parse_levels(module_levels).items():
+        logging.getLogger(name).setLevel(module_level)
+
+
+__all__ = [
+    'request_id_var',
+    'RequestIdFilter',
+    'DebugSamplingFilter',
+    'JsonFormatter',
+    'setup_logging',
+]
@@ -0,0 +1,92 @@
+"""
+监控指标 - 对话流程分阶段耗时、token用量和数据库连接池的Prometheus指标
+"""
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+from agentchat_fastapi.api.database import engine
+
+
+# 对话流程各阶段耗时
+CHAT_STAGE_SECONDS = Histogram(
+    "chat_stage_duration_seconds",
+    "对话流程各阶段耗时（秒）",
+    ["stage"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+# 模型token用量，取自回复消息的 models_usage
+MODEL_TOKENS = Counter(
+    "chat_model_tokens_total",
+    "模型token用量",
+    ["kind"],
+)
+
+# 会话智能体缓存命中情况
+AGENT_CACHE_REQUESTS = Counter(
+    "chat_agent_cache_requests_total",
+    "会话智能体缓存请求次数",
+    ["result"],
+)
+
+# 数据库连接池状态，采集时实时读取
+_pool = engine.sync_engine.pool
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out_connections", "已借出的数据库连接数")
+DB_POOL_CHECKED_OUT.set_function(lambda: _pool.checkedout())
+DB_POOL_CHECKED_IN = Gauge("db_pool_checked_in_connections", "池中空闲的数据库连接数")
+DB_POOL_CHECKED_IN.set_function(lambda: _pool.checkedin())
+DB_POOL_OVERFLOW = Gauge("db_pool_overflow_connections", "超出pool_size的溢出连接数")
+DB_POOL_OVERFLOW.set_function(lambda: _pool.overflow())
+DB_POOL_SIZE = Gauge("db_pool_size", "连接池大小")
+DB_POOL_SIZE.set_function(lambda: _pool.size())
+
+
+@contextmanager
+def observe_stage(stage: str) -> Iterator[None]:
+    """记录一个对话阶段的耗时
+
+    阶段名称：session_fetch、agent_construct、load_state、llm_call、
+    save_state、message_insert、commit
+    """
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        CHAT_STAGE_SECONDS.labels(stage=stage).observe(time.perf_counter() - started_at)
+
+
+def record_usage(models_usage: Any) -> None:
+    """累计回复消息中的prompt和completion token数"""
+    if not models_usage:
+        return
+    if isinstance(models_usage, dict):
+        prompt_tokens = models_usage.get("prompt_tokens") or 0
+        completion_tokens = models_usage.get("completion_tokens") or 0
+    else:
+        prompt_tokens = getattr(models_usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(models_usage, "completion_tokens", 0) or 0
+    MODEL_TOKENS.labels(kind="prompt").inc(prompt_tokens)
+    MODEL_TOKENS.labels(kind="completion").inc(completion_tokens)
+
+
+router = APIRouter(tags=["监控"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    """Prometheus指标"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+__all__ = [
+    'CHAT_STAGE_SECONDS',
+    'MODEL_TOKENS',
+    'AGENT_CACHE_REQUESTS',
+    'observe_stage',
+    'record_usage',
+    'router',
+]
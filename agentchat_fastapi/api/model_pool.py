@@ -0,0 +1,123 @@
+"""
+模型客户端池 - 进程级共享的模型客户端
+"""
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Dict, Optional
+
+import yaml
+from autogen_core.models import ChatCompletionClient
+
+
+logger = logging.getLogger(__name__)
+
+
+class ModelClientPool:
+    """模型客户端池
+
+    按配置文件内容的哈希值缓存 ChatCompletionClient，应用生命周期内复用同一个
+    客户端（HTTP 连接池、分词器等）。配置文件在磁盘上发生变化时自动重新加载，
+    应用关闭时统一关闭所有客户端。
+    智能体以流式模式调用模型，OpenAI 系列客户端默认开启 stream_options.include_usage，
+    使流式和非流式接口都能拿到 models_usage。
+    """
+
+    def __init__(self, config_path: str):
+        """初始化模型客户端池
+
+        Args:
+            config_path: 模型配置文件路径
+        """
+        self.config_path = config_path
+        self._clients: Dict[str, ChatCompletionClient] = {}
+        self._current_key: Optional[str] = None
+        self._current_mtime: Optional[int] = None
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _with_stream_usage(model_config: dict) -> dict:
+        """为 OpenAI 系列客户端开启流式模式下的用量统计，配置中已显式设置时保持不变"""
+        if "OpenAIChatCompletionClient" in str(model_config.get("provider", "")):
+            config = model_config.setdefault("config", {})
+            config.setdefault("stream_options", {"include_usage": True})
+        return model_config
+
+    @staticmethod
+    def _hash_config(raw: bytes) -> str:
+        """计算配置内容的哈希值"""
+        return hashlib.sha256(raw).hexdigest()
+
+    async def get_client(self) -> ChatCompletionClient:
+        """获取当前配置对应的模型客户端"""
+        mtime = os.stat(self.config_path).st_mtime_ns
+        # 快速路径：配置文件未变化，直接返回当前客户端
+        if self._current_key is not None and mtime == self._current_mtime:
+            return self._clients[self._current_key]
+
+        async with self._lock:
+            # 双重检查，避免并发请求重复加载
+            if self._current_key is not None and mtime == self._current_mtime:
+                return self._clients[self._current_key]
+
+            with open(self.config_path, "rb") as file:
+                raw = file.read()
+            key = self._hash_config(raw)
+
+            if key not in self._clients:
+                model_config = self._with_stream_usage(yaml.safe_load(raw))
+                self._clients[key] = ChatCompletionClient.load_component(model_config)
+                if self._current_key is not None:
+                    logger.info("模型配置已变更，重新加载模型客户端: %s", key[:12])
+
+            # 旧客户端可能仍被进行中的请求使用，保留到应用关闭时统一释放
+            self._current_key = key
+            self._current_mtime = mtime
+            return self._clients[key]
+
+    async def close(self) -> None:
+        """关闭池中所有模型客户端"""
+        async with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._current_key = None
+            self._current_mtime = None
+
+        for client in clients:
+            try:
+                await client.close()
+            except Exception as e:
+                logger.warning("关闭模型客户端出错: %s", e)
+
+
+# 进程级模型客户端池，由应用 lifespan 创建和关闭
+_model_client_pool: Optional[ModelClientPool] = None
+
+
+def init_model_client_pool(config_path: str) -> ModelClientPool:
+    """创建进程级模型客户端池"""
+    global _model_client_pool
+    _model_client_pool = ModelClientPool(config_path)
+    return _model_client_pool
+
+
+def get_model_client_pool() -> Optional[ModelClientPool]:
+    """获取进程级模型客户端池，未初始化时返回None"""
+    return _model_client_pool
+
+
+async def close_model_client_pool() -> None:
+    """关闭并释放进程级模型客户端池"""
+    global _model_client_pool
+    if _model_client_pool is not None:
+        await _model_client_pool.close()
+        _model_client_pool = None
+
+
+__all__ = [
+    'ModelClientPool',
+    'init_model_client_pool',
+    'get_model_client_pool',
+    'close_model_client_pool',
+]
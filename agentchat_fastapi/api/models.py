@@ -5,7 +5,7 @@ import uuid
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 
-from sqlalchemy import String, ForeignKey, JSON, func, text
+from sqlalchemy import String, Integer, ForeignKey, Index, JSON, Text, func, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import mapped_column, relationship, Mapped
 
@@ -48,10 +48,36 @@ class ChatSession(Base):
         default=dict,
         comment="智能体状态，存储为JSON"
     )
+    context_length: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default=text("0"),
+        comment="已追加到上下文日志的消息数量"
+    )
+    message_count: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default=text("0"),
+        comment="会话消息数量，随消息写入维护"
+    )
+    context_summary: Mapped[Optional[str]] = mapped_column(
+        Text,
+        nullable=True,
+        comment="滚动摘要上下文策略缓存的历史摘要"
+    )
+    context_summary_count: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default=text("0"),
+        comment="已合并进历史摘要的上下文消息数量"
+    )
     
-    # 关系
+    # 关系：默认不加载消息，需要时通过 selectinload 显式加载；删除依赖数据库级联
     messages: Mapped[List["ChatMessage"]] = relationship(
-        "ChatMessage", back_populates="session", cascade="all, delete", lazy="selectin"
+        "ChatMessage", back_populates="session", cascade="all, delete", passive_deletes=True, lazy="raise"
     )
     
     def to_dict(self) -> Dict[str, Any]:
@@ -61,32 +87,30 @@ class ChatSession(Base):
             "name": self.name,
             "created_at": self.created_at.isoformat(),
             "updated_at": self.updated_at.isoformat(),
-            "message_count": len(self.messages) if self.messages else 0
+            "message_count": self.message_count or 0
         }
     
-    def generate_name_from_first_message(self) -> str:
-        """根据第一条消息生成会话名称"""
-        if not self.messages:
-            return self.name
-            
-        # 找到第一条用户消息
-        user_messages = [msg for msg in self.messages if msg.source == "user"]
-        if not user_messages:
-            return self.name
-            
-        first_message = user_messages[0]
-        content = first_message.content
-        
+    @staticmethod
+    def generate_name_from_content(content: str) -> str:
+        """根据首条用户消息内容生成会话名称"""
         # 截取前20个字符作为会话名称
         if len(content) > 20:
             return content[:20] + "..."
         return content
 
 
+# 会话列表键集分页
+Index("ix_chat_sessions_updated_at_id", ChatSession.updated_at.desc(), ChatSession.id.desc())
+
+
 class ChatMessage(Base):
     """聊天消息模型"""
     __tablename__ = "chat_messages"
-    __table_args__ = {"comment": "聊天消息表"}
+    __table_args__ = (
+        # 会话历史键集分页
+        Index("ix_chat_messages_session_id_created_at_id", "session_id", "created_at", "id"),
+        {"comment": "聊天消息表"},
+    )
     
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), 
@@ -120,7 +144,8 @@ class ChatMessage(Base):
         comment="思考过程，仅适用于智能体消息"
     )
     created_at: Mapped[datetime] = mapped_column(
-        default=func.now(), 
+        # 使用clock_timestamp()而非事务开始时间now()，同一事务内的多条消息时间递增
+        default=func.clock_timestamp(), 
         server_default=text("now()"), 
         nullable=False,
         comment="创建时间"
@@ -158,3 +183,36 @@ class ChatMessage(Base):
             result["thought"] = self.thought
             
         return result
+
+
+class ChatContextMessage(Base):
+    """智能体上下文消息模型
+
+    按序追加保存智能体状态中 llm_context.messages 的每一条消息，
+    每轮对话只写入新增的消息，加载时再拼装为完整的智能体状态。
+    """
+    __tablename__ = "chat_context_messages"
+    __table_args__ = {"comment": "智能体上下文消息表"}
+
+    session_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("chat_sessions.id", ondelete="CASCADE"),
+        primary_key=True,
+        comment="关联的会话ID"
+    )
+    seq: Mapped[int] = mapped_column(
+        Integer,
+        primary_key=True,
+        comment="消息在上下文中的序号，从0开始"
+    )
+    message: Mapped[Dict[str, Any]] = mapped_column(
+        JSON,
+        nullable=False,
+        comment="序列化的LLM上下文消息"
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        default=func.now(),
+        server_default=text("now()"),
+        nullable=False,
+        comment="创建时间"
+    )
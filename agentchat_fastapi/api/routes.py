@@ -1,31 +1,63 @@
 """
 API路由 - 主要API端点
 """
-from typing import Any, Dict, List, Optional
+import json
+import logging
+from datetime import datetime
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, WebSocket
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 
 from autogen_agentchat.messages import TextMessage
 from autogen_core import CancellationToken
 
-from agentchat_fastapi.api.services import get_agent, ChatMessageService, ChatSessionService
+from agentchat_fastapi.api.agent_cache import get_agent_cache
+from agentchat_fastapi.api.chat_stream import build_chat_result, stream_chat, WebSocketChatConnection
+from agentchat_fastapi.api.services import ChatMessageService, ChatSessionService, decode_cursor, encode_cursor
 from agentchat_fastapi.api.models import ChatSession
 from agentchat_fastapi.api.database import get_db
+from agentchat_fastapi.api.metrics import observe_stage, record_usage
+
+
+logger = logging.getLogger(__name__)
+
 
 router = APIRouter(tags=["会话管理"])
 
+# 下一页游标通过响应头返回，保持列表响应体不变
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _parse_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, UUID]]:
+    """解析分页游标，无效时返回400"""
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="无效的分页游标") from e
+
+
 @router.get("/sessions")
 async def list_sessions(
+    response: Response,
     limit: int = Query(10, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="上一页响应头X-Next-Cursor中的游标，提供时忽略offset"),
     db: AsyncSession = Depends(get_db)
 ) -> List[Dict[str, Any]]:
     """获取会话列表"""
+    position = _parse_cursor(cursor)
     try:
-        sessions = await ChatSessionService.list_sessions(db, limit, offset)
+        sessions = await ChatSessionService.list_sessions(db, limit, offset, position)
+        if len(sessions) == limit:
+            last = sessions[-1]
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.updated_at, last.id)
         return [session.to_dict() for session in sessions]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
@@ -54,9 +86,7 @@ async def create_session(
         return session.to_dict()
     except Exception as e:
         # 记录详细错误信息
-        import traceback
-        error_detail = f"{str(e)}\n{traceback.format_exc()}"
-        print(f"创建会话错误: {error_detail}")
+        logger.exception("创建会话错误")
         await db.rollback()  # 显式回滚事务
         raise HTTPException(status_code=500, detail=str(e)) from e
 
@@ -92,6 +122,7 @@ async def delete_session(
             
         # 使用ORM方式删除会话（级联删除会自动处理关联的消息）
         await db.delete(session)
+        get_agent_cache().discard(session_id)
         
         # 提交事务
         await db.commit()
@@ -101,7 +132,7 @@ async def delete_session(
         raise
     except Exception as e:
         # 记录详细错误信息以便调试
-        print(f"删除会话错误: {str(e)}")
+        logger.exception("删除会话错误", extra={"session_id": str(session_id)})
         await db.rollback()
         raise HTTPException(status_code=500, detail=str(e)) from e
 
@@ -109,11 +140,14 @@ async def delete_session(
 @router.get("/sessions/{session_id}/history")
 async def get_history(
     session_id: UUID,
+    response: Response,
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="上一页响应头X-Next-Cursor中的游标，提供时忽略offset"),
     db: AsyncSession = Depends(get_db)
 ) -> List[Dict[str, Any]]:
     """获取会话历史记录"""
+    position = _parse_cursor(cursor)
     try:
         # 检查会话是否存在
         session = await ChatSessionService.get_session(db, session_id)
@@ -121,7 +155,12 @@ async def get_history(
             raise HTTPException(status_code=404, detail="会话不存在")
         
         # 获取会话消息
-        messages = await ChatMessageService.get_session_messages(db, session_id, limit, offset)
+        messages = await ChatMessageService.get_session_messages(
+            db, session_id, limit, offset, cursor=position
+        )
+        if len(messages) == limit:
+            last = messages[-1]
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, last.id)
         return await ChatMessageService.convert_to_dict_list(messages)
     except HTTPException:
         raise
@@ -138,75 +177,103 @@ async def chat(
     """发送消息并获取回复"""
     try:
         # 检查会话是否存在
-        session = await ChatSessionService.get_session(db, session_id)
+        with observe_stage("session_fetch"):
+            session = await ChatSessionService.get_session(db, session_id)
         if not session:
             raise HTTPException(status_code=404, detail="会话不存在")
         
-        # 保存用户消息
-        await ChatMessageService.create_from_text_message(db, session_id, request)
-        
-        # 获取智能体并响应消息
-        agent = await get_agent(session_id, db)
-        response = await agent.on_messages(messages=[request], cancellation_token=CancellationToken())
+        # 保存并提交用户消息：插入消息会锁定会话行，必须在等待会话锁之前提交，
+        # 否则后台写回持有会话锁后更新同一行，与本请求互相等待
+        with observe_stage("message_insert"):
+            await ChatMessageService.create_from_text_message(db, session_id, request)
+        with observe_stage("commit"):
+            await db.commit()
         
-        # 记录详细的调试信息
-        print(f"Response type: {type(response)}")
-        print(f"Response content: {response.content if hasattr(response, 'content') else 'No content'}")
-        print(f"Response attributes: {dir(response)}")
-        if hasattr(response, 'models_usage'):
-            print(f"Models usage type: {type(response.models_usage)}")
-            print(f"Models usage attributes: {dir(response.models_usage) if response.models_usage else 'None'}")
-        if hasattr(response, 'metadata') and response.metadata:
-            print(f"Metadata: {response.metadata}")
-        if hasattr(response, 'meta_data') and response.meta_data:
-            print(f"Meta data: {response.meta_data}")
+        # 从缓存获取智能体并响应消息，状态由缓存延迟写回
+        async with get_agent_cache().checkout(session_id, db) as agent:
+            with observe_stage("llm_call"):
+                response = await agent.on_messages(messages=[request], cancellation_token=CancellationToken())
+        record_usage(response.chat_message.models_usage)
         
-        # 保存智能体状态
-        state = await agent.save_state()
-        
-        # 确保状态包含必要的字段
-        if "type" not in state:
-            state["type"] = "AssistantAgentState"
-        if "version" not in state:
-            state["version"] = "1.0.0"
-        if "llm_context" not in state:
-            state["llm_context"] = {"messages": []}
-            
-        await ChatSessionService.update_agent_state(db, session_id, state)
+        # 记录详细的调试信息（仅在启用DEBUG时构造）
+        if logger.isEnabledFor(logging.DEBUG):
+            chat_message = response.chat_message
+            logger.debug(
+                "Agent response %s",
+                type(chat_message).__name__,
+                extra={
+                    "session_id": str(session_id),
+                    "content": getattr(chat_message, "content", None),
+                    "models_usage": getattr(chat_message, "models_usage", None),
+                    "metadata": getattr(chat_message, "metadata", None),
+                },
+            )
         
         # 保存智能体回复
         assert isinstance(response.chat_message, TextMessage)
-        await ChatMessageService.create_from_text_message(db, session_id, response.chat_message)
+        with observe_stage("message_insert"):
+            await ChatMessageService.create_from_text_message(db, session_id, response.chat_message)
         
         # 提交事务，确保所有更改都被保存到数据库
-        await db.commit()
+        with observe_stage("commit"):
+            await db.commit()
         
-        # 手动创建响应字典，而不是调用to_dict方法
-        if hasattr(response.chat_message, 'to_dict'):
-            # 如果对象有to_dict方法，使用它
-            result = response.chat_message.to_dict()
-        else:
-            # 否则手动创建字典
-            result = {
-                "content": response.chat_message.content if hasattr(response.chat_message, 'content') else "",
-                "source": response.chat_message.source if hasattr(response.chat_message, 'source') else "assistant",
-                "type": response.chat_message.type if hasattr(response.chat_message, 'type') else "TextMessage",
-                "models_usage": response.chat_message.models_usage if hasattr(response.chat_message, 'models_usage') else None,
-                "metadata": response.chat_message.metadata if hasattr(response.chat_message, 'metadata') else {}
-            }
-            # 添加thought字段（如果存在）
-            if hasattr(response.chat_message, 'thought') and response.chat_message.thought:
-                result["thought"] = response.chat_message.thought
+        result = build_chat_result(response.chat_message)
         
         return result
     except Exception as e:
         # 记录详细的错误信息
-        import traceback
-        print(f"Error in chat endpoint: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error in chat endpoint", extra={"session_id": str(session_id)})
         error_message = {
             "type": "error",
             "content": f"Error: {str(e)}",
             "source": "system"
         }
         raise HTTPException(status_code=500, detail=error_message) from e
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """格式化一条SSE事件"""
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data), ensure_ascii=False)}\n\n"
+
+
+@router.post("/sessions/{session_id}/chat/stream")
+async def chat_stream(
+    session_id: UUID,
+    request: TextMessage,
+    db: AsyncSession = Depends(get_db)
+) -> StreamingResponse:
+    """发送消息并以SSE流式返回回复
+
+    依次推送 token 事件（模型生成的增量文本）、message 事件（完整回复）和 done 事件；
+    出错时推送 error 事件。客户端断开连接时取消模型调用。
+    """
+    # 检查会话是否存在
+    session = await ChatSessionService.get_session(db, session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="会话不存在")
+
+    async def event_stream() -> AsyncGenerator[str, None]:
+        try:
+            async for event in stream_chat(session_id, request, CancellationToken()):
+                yield _sse(event.pop("event"), event)
+            yield _sse("done", {})
+        except Exception as e:
+            logger.exception("Error in chat stream endpoint", extra={"session_id": str(session_id)})
+            yield _sse("error", {
+                "type": "error",
+                "content": f"Error: {str(e)}",
+                "source": "system"
+            })
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket) -> None:
+    """WebSocket对话，一个连接可复用于多个会话，协议见 WebSocketChatConnection"""
+    await WebSocketChatConnection(websocket).serve()
@@ -1,46 +1,76 @@
 """
 服务层 - 处理数据库操作和智能体交互
 """
+import base64
+import json
+import logging
 import os
 import uuid
+from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple
 
-import yaml
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.messages import TextMessage
-from autogen_core.models import ChatCompletionClient
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, insert, update, tuple_
+from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from agentchat_fastapi.api.models import ChatMessage, ChatSession
+from agentchat_fastapi.api.context_policy import create_model_context
+from agentchat_fastapi.api.metrics import observe_stage
+from agentchat_fastapi.api.model_pool import get_model_client_pool, init_model_client_pool
+from agentchat_fastapi.api.models import ChatContextMessage, ChatMessage, ChatSession
+
+
+logger = logging.getLogger(__name__)
 
 
 # 模型配置路径
 model_config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "model_config.yaml")
 
 
+def encode_cursor(timestamp: datetime, row_id: uuid.UUID) -> str:
+    """将 (时间戳, ID) 编码为不透明的分页游标"""
+    raw = json.dumps([timestamp.isoformat(), str(row_id)])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """解码分页游标，格式无效时抛出ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(timestamp), uuid.UUID(row_id)
+    except Exception as e:
+        raise ValueError(f"无效的分页游标: {cursor}") from e
+
+
 async def get_agent(
     session_id: Optional[uuid.UUID] = None,
     db: AsyncSession = None
 ) -> AssistantAgent:
     """获取智能体，从数据库加载状态"""
-    # 获取模型客户端配置
-    with open(model_config_path, "r") as file:
-        model_config = yaml.safe_load(file.read())
-    model_client = ChatCompletionClient.load_component(model_config)
-    
-    # 创建智能体
-    agent = AssistantAgent(
-        name="assistant",
-        model_client=model_client,
-        system_message="You are a helpful assistant."
-    )
+    with observe_stage("agent_construct"):
+        # 从进程级客户端池获取模型客户端（未在lifespan中初始化时按需创建）
+        pool = get_model_client_pool() or init_model_client_pool(model_config_path)
+        model_client = await pool.get_client()
+        
+        # 创建智能体
+        agent = AssistantAgent(
+            name="assistant",
+            model_client=model_client,
+            # 按配置的上下文策略限制发送给模型的上下文，持久化的仍是完整历史
+            model_context=create_model_context(model_client),
+            system_message="You are a helpful assistant.",
+            # 启用流式输出以支持SSE等流式接口，非流式调用仍返回完整回复
+            model_client_stream=True,
+        )
     
     # 如果提供了会话ID，则从数据库加载状态
     if session_id and db:
-        session = await ChatSessionService.get_session(db, session_id)
-        if session and session.agent_state:
-            await agent.load_state(session.agent_state)
+        with observe_stage("load_state"):
+            agent_state = await ChatSessionService.load_agent_state(db, session_id)
+            if agent_state:
+                await agent.load_state(agent_state)
     
     return agent
 
@@ -79,9 +109,14 @@ class ChatSessionService:
         return session
     
     @staticmethod
-    async def get_session(db: AsyncSession, session_id: uuid.UUID) -> Optional[ChatSession]:
-        """获取会话"""
-        result = await db.execute(select(ChatSession).where(ChatSession.id == session_id))
+    async def get_session(
+        db: AsyncSession, session_id: uuid.UUID, with_messages: bool = False
+    ) -> Optional[ChatSession]:
+        """获取会话，with_messages为True时同时加载全部消息"""
+        query = select(ChatSession).where(ChatSession.id == session_id)
+        if with_messages:
+            query = query.options(selectinload(ChatSession.messages))
+        result = await db.execute(query)
         return result.scalars().first()
     
     @staticmethod
@@ -93,13 +128,24 @@ class ChatSessionService:
         return result.scalars().first()
     
     @staticmethod
-    async def list_sessions(db: AsyncSession, limit: int = 10, offset: int = 0) -> List[ChatSession]:
-        """列出会话"""
+    async def list_sessions(
+        db: AsyncSession,
+        limit: int = 10,
+        offset: int = 0,
+        cursor: Optional[Tuple[datetime, uuid.UUID]] = None
+    ) -> List[ChatSession]:
+        """列出会话，按更新时间倒序
+
+        提供cursor（上一页最后一个会话的 (updated_at, id)）时使用键集分页，
+        忽略offset，任意页的查询代价相同。
+        """
+        query = select(ChatSession)
+        if cursor is not None:
+            query = query.where(tuple_(ChatSession.updated_at, ChatSession.id) < tuple_(*cursor))
+        elif offset:
+            query = query.offset(offset)
         result = await db.execute(
-            select(ChatSession)
-            .order_by(ChatSession.updated_at.desc())
-            .limit(limit)
-            .offset(offset)
+            query.order_by(ChatSession.updated_at.desc(), ChatSession.id.desc()).limit(limit)
         )
         return list(result.scalars().all())
     
@@ -123,11 +169,107 @@ class ChatSessionService:
                 
             if "llm_context" not in agent_state:
                 agent_state["llm_context"] = {"messages": []}
-                
-            session.agent_state = agent_state
+
+            # 上下文消息全量重写到上下文日志，状态列中只保留其余字段
+            llm_context = dict(agent_state["llm_context"])
+            messages = llm_context.pop("messages", None) or []
+            llm_context["messages"] = []
+            ChatSessionService._store_context_summary(session, llm_context)
+            session.agent_state = {**agent_state, "llm_context": llm_context}
+
+            await db.execute(
+                delete(ChatContextMessage).where(ChatContextMessage.session_id == session_id)
+            )
+            await ChatSessionService._insert_context_messages(db, session_id, 0, messages)
+            session.context_length = len(messages)
             db.add(session)
             await db.flush()
         return session
+
+    @staticmethod
+    async def append_agent_state(
+        db: AsyncSession, session_id: uuid.UUID, agent_state: Dict[str, Any]
+    ) -> Optional[ChatSession]:
+        """增量更新智能体状态，只追加新增的上下文消息
+
+        新状态的上下文消息应以已持久化的消息为前缀，每轮写入量与新增消息数成正比；
+        消息数量少于已持久化数量时（上下文被截断或重建）退化为全量重写。
+        """
+        session = await ChatSessionService.get_session(db, session_id)
+        if not session:
+            return None
+
+        messages = agent_state.get("llm_context", {}).get("messages", [])
+        inline_messages = ((session.agent_state or {}).get("llm_context") or {}).get("messages") or []
+        persisted = len(inline_messages) + session.context_length
+        if len(messages) < persisted:
+            return await ChatSessionService.update_agent_state(db, session_id, agent_state)
+
+        new_messages = messages[persisted:]
+        summary_changed = ChatSessionService._store_context_summary(
+            session, dict(agent_state.get("llm_context", {}))
+        )
+        if new_messages:
+            await ChatSessionService._insert_context_messages(
+                db, session_id, session.context_length, new_messages
+            )
+            session.context_length += len(new_messages)
+        if new_messages or summary_changed:
+            db.add(session)
+            await db.flush()
+        return session
+
+    @staticmethod
+    def _store_context_summary(session: ChatSession, llm_context: Dict[str, Any]) -> bool:
+        """将上下文状态中的历史摘要取出并缓存到会话行，返回摘要是否有变化"""
+        if "summary" not in llm_context:
+            return False
+        summary = llm_context.pop("summary")
+        summary_count = llm_context.pop("summarized_count", 0) or 0
+        if summary == session.context_summary and summary_count == session.context_summary_count:
+            return False
+        session.context_summary = summary
+        session.context_summary_count = summary_count
+        return True
+
+    @staticmethod
+    async def load_agent_state(db: AsyncSession, session_id: uuid.UUID) -> Optional[Dict[str, Any]]:
+        """加载完整的智能体状态，将上下文日志拼装回 llm_context.messages"""
+        session = await ChatSessionService.get_session(db, session_id)
+        if not session or not session.agent_state:
+            return None
+
+        agent_state = dict(session.agent_state)
+        llm_context = dict(agent_state.get("llm_context") or {})
+        messages = list(llm_context.get("messages") or [])
+        if session.context_length:
+            result = await db.execute(
+                select(ChatContextMessage.message)
+                .where(ChatContextMessage.session_id == session_id)
+                .order_by(ChatContextMessage.seq.asc())
+            )
+            messages.extend(result.scalars().all())
+        llm_context["messages"] = messages
+        if session.context_summary is not None:
+            llm_context["summary"] = session.context_summary
+            llm_context["summarized_count"] = session.context_summary_count
+        agent_state["llm_context"] = llm_context
+        return agent_state
+
+    @staticmethod
+    async def _insert_context_messages(
+        db: AsyncSession, session_id: uuid.UUID, start_seq: int, messages: List[Dict[str, Any]]
+    ) -> None:
+        """批量追加上下文消息"""
+        if not messages:
+            return
+        await db.execute(
+            insert(ChatContextMessage),
+            [
+                {"session_id": session_id, "seq": start_seq + i, "message": message}
+                for i, message in enumerate(messages)
+            ],
+        )
     
     @staticmethod
     async def delete_session(db: AsyncSession, session_id: uuid.UUID) -> bool:
@@ -152,7 +294,7 @@ class ChatSessionService:
             await db.flush()
             return True
         except Exception as e:
-            print(f"删除会话服务错误: {e}")
+            logger.error("删除会话服务错误: %s", e)
             return False
     
     @staticmethod
@@ -160,7 +302,17 @@ class ChatSessionService:
         """根据消息更新会话名称"""
         session = await ChatSessionService.get_session(db, session_id)
         if session:
-            new_name = session.generate_name_from_first_message()
+            # 只查询第一条用户消息
+            result = await db.execute(
+                select(ChatMessage.content)
+                .where(ChatMessage.session_id == session_id, ChatMessage.source == "user")
+                .order_by(ChatMessage.created_at.asc())
+                .limit(1)
+            )
+            content = result.scalars().first()
+            if content is None:
+                return session
+            new_name = ChatSession.generate_name_from_content(content)
             if new_name != session.name:
                 session.name = new_name
                 db.add(session)
@@ -170,11 +322,11 @@ class ChatSessionService:
     @staticmethod
     async def get_agent_state_messages(db: AsyncSession, session_id: uuid.UUID) -> List[Dict[str, Any]]:
         """获取智能体状态中的消息列表"""
-        session = await ChatSessionService.get_session(db, session_id)
-        if not session or not session.agent_state or "llm_context" not in session.agent_state:
+        agent_state = await ChatSessionService.load_agent_state(db, session_id)
+        if not agent_state or "llm_context" not in agent_state:
             return []
             
-        llm_context = session.agent_state.get("llm_context", {})
+        llm_context = agent_state.get("llm_context", {})
         return llm_context.get("messages", [])
 
 
@@ -205,10 +357,22 @@ class ChatMessageService:
         db.add(message)
         await db.flush()
         
-        # 如果是会话的第一条消息，更新会话名称
-        session = await ChatSessionService.get_session(db, session_id)
-        if session and len(session.messages) == 1:
-            await ChatSessionService.update_session_name_from_messages(db, session_id)
+        # 原子递增会话消息计数
+        result = await db.execute(
+            update(ChatSession)
+            .where(ChatSession.id == session_id)
+            .values(message_count=ChatSession.message_count + 1)
+            .returning(ChatSession.message_count)
+        )
+        message_count = result.scalar_one_or_none()
+        
+        # 如果是会话的第一条消息且来自用户，根据内容更新会话名称
+        if message_count == 1 and source == "user":
+            await db.execute(
+                update(ChatSession)
+                .where(ChatSession.id == session_id)
+                .values(name=ChatSession.generate_name_from_content(content))
+            )
         
         return message
     
@@ -217,28 +381,29 @@ class ChatMessageService:
         db: AsyncSession, session_id: uuid.UUID, message: TextMessage
     ) -> ChatMessage:
         """从TextMessage创建消息"""
-        # 记录详细的调试信息
-        print(f"Creating message from TextMessage: {type(message)}")
-        print(f"Message attributes: {dir(message)}")
+        # 记录详细的调试信息（dir()开销较大，仅在启用DEBUG时计算）
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Creating message from %s",
+                type(message).__name__,
+                extra={"session_id": str(session_id), "attributes": dir(message)},
+            )
         
         # 尝试从message中提取thought字段
         thought = None
         if hasattr(message, 'thought'):
             thought = message.thought
-            print(f"Found thought: {thought}")
         
         # 处理models_usage，确保它是可序列化的
         models_usage = None
         if hasattr(message, 'models_usage') and message.models_usage:
             models_usage = message.models_usage
-            print(f"Models usage type: {type(models_usage)}")
             
             if not isinstance(models_usage, dict):
                 # 如果是RequestUsage对象，转换为字典
                 try:
                     if hasattr(models_usage, '__dict__'):
                         models_usage = models_usage.__dict__
-                        print(f"Converted models_usage using __dict__: {models_usage}")
                     elif hasattr(models_usage, 'prompt_tokens') and hasattr(models_usage, 'completion_tokens'):
                         models_usage = {
                             'prompt_tokens': models_usage.prompt_tokens,
@@ -246,20 +411,18 @@ class ChatMessageService:
                             'total_tokens': getattr(models_usage, 'total_tokens', 
                                                 models_usage.prompt_tokens + models_usage.completion_tokens)
                         }
-                        print(f"Converted models_usage manually: {models_usage}")
                     else:
                         # 如果无法转换，设置为None
-                        print(f"Could not convert models_usage, setting to None")
+                        logger.warning("Could not convert models_usage of type %s", type(models_usage).__name__)
                         models_usage = None
                 except Exception as e:
-                    print(f"Error converting models_usage: {str(e)}")
+                    logger.warning("Error converting models_usage: %s", e)
                     models_usage = None
         
         # 获取元数据，统一使用meta_data字段名
         meta_data = {}
         if hasattr(message, 'metadata'):
             meta_data = message.metadata
-            print(f"Found metadata: {meta_data}")
         
         try:
             # 创建消息
@@ -273,12 +436,10 @@ class ChatMessageService:
                 models_usage=models_usage,
                 meta_data=meta_data
             )
-            print(f"Created chat message: {chat_message.id}")
+            logger.debug("Created chat message %s", chat_message.id, extra={"session_id": str(session_id)})
             return chat_message
-        except Exception as e:
-            import traceback
-            print(f"Error creating message: {str(e)}")
-            print(traceback.format_exc())
+        except Exception:
+            logger.exception("Error creating message", extra={"session_id": str(session_id)})
             raise
     
     @staticmethod
@@ -287,17 +448,26 @@ class ChatMessageService:
         session_id: uuid.UUID,
         limit: int = 100,
         offset: int = 0,
-        source: Optional[str] = None
+        source: Optional[str] = None,
+        cursor: Optional[Tuple[datetime, uuid.UUID]] = None
     ) -> List[ChatMessage]:
-        """获取会话消息"""
+        """获取会话消息
+
+        提供cursor（上一页最后一条消息的 (created_at, id)）时使用键集分页，忽略offset。
+        """
         query = select(ChatMessage).where(ChatMessage.session_id == session_id)
         
         # 如果指定了source，添加过滤条件
         if source:
             query = query.where(ChatMessage.source == source)
+        
+        if cursor is not None:
+            query = query.where(tuple_(ChatMessage.created_at, ChatMessage.id) > tuple_(*cursor))
+        elif offset:
+            query = query.offset(offset)
             
-        # 按照创建时间升序排列，确保消息按照正确的顺序显示
-        query = query.order_by(ChatMessage.created_at.asc()).limit(limit).offset(offset)
+        # 按照创建时间升序排列，确保消息按照正确的顺序显示；id保证同一时间戳内顺序稳定
+        query = query.order_by(ChatMessage.created_at.asc(), ChatMessage.id.asc()).limit(limit)
         result = await db.execute(query)
         return list(result.scalars().all())
     
@@ -2,12 +2,14 @@
 FastAPI智能体聊天应用 - 主入口文件
 """
 
+import logging
 import os
 import sys
+import uuid
 from pathlib import Path
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import uvicorn
@@ -20,17 +22,32 @@ if str(project_root) not in sys.path:
 
 # 导入数据库引擎和相关组件
 from agentchat_fastapi.api.database import engine
+from agentchat_fastapi.api.model_pool import init_model_client_pool, close_model_client_pool
+from agentchat_fastapi.api.agent_cache import init_agent_cache, close_agent_cache
+from agentchat_fastapi.api.services import model_config_path
+from agentchat_fastapi.api.logging_config import request_id_var, setup_logging
+
+# 配置结构化日志
+setup_logging()
+logger = logging.getLogger(__name__)
 
 
 # 创建应用启动和关闭的上下文管理器
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # 应用启动时执行
-    print("应用启动，初始化数据库连接...")
+    logger.info("应用启动，初始化数据库连接...")
+    # 创建进程级模型客户端池，所有请求共享
+    init_model_client_pool(model_config_path)
+    # 创建会话智能体缓存
+    init_agent_cache()
     # 应用运行中...
     yield
     # 应用关闭时执行
-    print("应用关闭，清理资源...")
+    logger.info("应用关闭，清理资源...")
+    # 先写回缓存中的智能体状态，再释放模型客户端和数据库连接
+    await close_agent_cache()
+    await close_model_client_pool()
     await engine.dispose()
 
 
@@ -38,7 +55,7 @@ async def lifespan(app: FastAPI):
 app = FastAPI(
     title="智能体聊天API",
     description="基于FastAPI的智能体聊天应用，支持会话管理和消息处理",
-    version="0.2.5",
+    version="0.3.0",
     lifespan=lifespan,
 )
 
@@ -49,16 +66,33 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # 允许所有方法
     allow_headers=["*"],  # 允许所有头部
+    expose_headers=["X-Next-Cursor", "X-Request-ID"],  # 允许前端读取分页游标和请求ID
 )
 
+# 为每个请求分配请求ID，写入日志上下文和响应头
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+
 # 挂载静态文件
 app.mount("/static", StaticFiles(directory=os.path.dirname(__file__)), name="static")
 
 # 导入路由
 from agentchat_fastapi.api.routes import router as api_router
+from agentchat_fastapi.api.metrics import router as metrics_router
 
 # 包含API路由
 app.include_router(api_router, prefix="/api")
+# Prometheus指标
+app.include_router(metrics_router)
 
 # 示例用法
 if __name__ == "__main__":
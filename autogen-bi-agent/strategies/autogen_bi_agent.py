@@ -1,7 +1,6 @@
 import json
 import time
 import os
-import asyncio
 from collections.abc import Generator
 from typing import Any, cast, Dict, List, Optional
 
@@ -18,6 +17,8 @@ from pydantic import BaseModel
 
 # 导入 AutoGen BI 智能体
 from autogenchat_bi.core.bi_orchestrator import BIAgent
+from autogenchat_bi.utils.event_loop import run_sync
+
 
 class AutoGenBIParams(BaseModel):
     maximum_iterations: int
@@ -82,7 +83,7 @@ class AutoGenBIAgentStrategy(AgentStrategy):
         error_message = ""
         
         try:
-            # 创建 BI 智能体
+            # 创建 BI 智能体（只保存对话状态，向量模型等重量级资源在进程内共享）
             bi_agent = BIAgent(
                 model_config=model_config,
                 conversation_id=conversation_id
@@ -97,11 +98,8 @@ class AutoGenBIAgentStrategy(AgentStrategy):
                             content=message.content
                         )
             
-            # 处理用户查询 - 使用异步运行但同步等待结果
-            event_loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(event_loop)
-            
-            result = event_loop.run_until_complete(bi_agent.process_query_async(params.query))
+            # 处理用户查询 - 在常驻事件循环中异步运行，同步等待结果
+            result = run_sync(bi_agent.process_query_async(params.query))
             response = result.get("response", "")
             
         except Exception as e:
@@ -5,10 +5,12 @@ BI 智能体模块
 import os
 import json
 import uuid
-import asyncio
-from typing import Dict, List, Any, Optional
+import weakref
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 
+from pydantic import ValidationError
+
 # 导入 AutoGen 组件
 from autogen_agentchat.ui import Console
 from autogen_agentchat.agents import UserProxyAgent
@@ -16,9 +18,22 @@ from autogen_agentchat.agents import UserProxyAgent
 # 导入项目组件
 from autogenchat_bi.utils.project_extractor import ProjectExtractor
 from autogenchat_bi.utils.date_parser import DateParser
-from autogenchat_bi.utils.target_extractor import TargetExtractor
-from autogenchat_bi.core.intent_agent import create_intent_agent
+from autogenchat_bi.utils.event_loop import run_sync
+from autogenchat_bi.utils.target_extractor import get_target_extractor
+from autogenchat_bi.core.intent_agent import (
+    BIExtraction,
+    create_fused_extraction_executor,
+    create_intent_executor,
+)
 from autogenchat_bi.core.collector_agent import create_collector_agent
+from autogenchat_bi.core.semantic_cache import SemanticCache, get_semantic_cache
+from autogenchat_bi.core.stage_scheduler import StageScheduler
+from autogenchat_bi.utils.relative_date import extract_date_context
+from autogenchat_bi.utils.project_gazetteer import normalize_project_name
+
+# 拒绝结构化输出（json_schema response_format）的模型客户端，在进程内共享的客户端上只记录一次，
+# 之后使用该客户端的 BIAgent 直接走分阶段提取，不再为每个查询先付出一次失败的融合提取调用
+_structured_output_unsupported: "weakref.WeakSet[Any]" = weakref.WeakSet()
 
 class BIAgent:
     """BI 智能体类
@@ -44,6 +59,15 @@ class BIAgent:
         self.use_stream_mode = model_config.get("use_stream_mode", True)
         # 是否打印流式输出，默认为 False
         self.print_stream_output = model_config.get("print_stream_output", False)
+        # 是否推测执行指标名称标准化，默认为 False
+        # 启用后在意图识别的同时以整句查询提前标准化指标名称，命中时节省一次串行的 LLM 调用
+        self.speculative_target = model_config.get("speculative_target", False)
+        # 是否使用融合提取，默认跟随 model_info.structured_output（未配置时为 True）
+        # 启用后一次结构化输出调用同时提取意图、项目、时间和指标，解析失败时回退到分阶段提取；
+        # 服务拒绝结构化输出格式时自动对该模型客户端关闭
+        self.fused_extraction = model_config.get(
+            "fused_extraction", (model_config.get("model_info") or {}).get("structured_output", True)
+        )
 
         # 初始化日期解析器
         self.date_parser = DateParser(llm_config=model_config)
@@ -56,17 +80,37 @@ class BIAgent:
             os.path.dirname(os.path.dirname(__file__)), "target-docs"
         )
         db_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "chroma_db")
-        self.target_extractor = TargetExtractor(
-            llm_config=model_config, docs_dir=docs_dir, db_path=db_path
+        # 解析器持有向量模型和ChromaDB客户端，在进程内共享，BIAgent 只保存对话状态
+        self.target_extractor = get_target_extractor(
+            llm_config=model_config,
+            docs_dir=docs_dir,
+            db_path=db_path,
+            embedding_backend=model_config.get("embedding_backend", "torch"),
         )
 
+        # 语义结果缓存，进程内共享，语义相近且日期、项目相同的查询直接复用参数提取结果
+        self.semantic_cache: Optional[SemanticCache] = None
+        if model_config.get("semantic_cache", True):
+            self.semantic_cache = get_semantic_cache(
+                threshold=model_config.get("semantic_cache_threshold", 0.95),
+                ttl=model_config.get("semantic_cache_ttl", 3600),
+                max_size=model_config.get("semantic_cache_size", 1000),
+            )
+
         # 初始化智能体
         self._init_agents()
 
     def _init_agents(self):
         """初始化智能体"""
-        # 创建意图识别智能体
-        self.intent_agent = create_intent_agent(self.model_config, self.use_stream_mode)
+        # 创建意图识别执行器
+        self.intent_executor = create_intent_executor(
+            self.model_config, self.use_stream_mode, self.print_stream_output
+        )
+
+        # 创建融合提取执行器
+        self.fused_executor = create_fused_extraction_executor(
+            self.model_config, self.use_stream_mode, self.print_stream_output
+        )
 
         # 创建信息收集智能体
         self.collector_agent = create_collector_agent(self.model_config, self.use_stream_mode)
@@ -102,14 +146,40 @@ class BIAgent:
             "current_time": datetime.now().isoformat(),
         }
 
-        # 1. 意图识别
-        intent_result = await self._analyze_intent_async(query_text, context)
+        # 查询语义缓存，命中时跳过所有 LLM 调用
+        cache_key = await self._semantic_cache_key(query_text)
+        if cache_key is not None:
+            # 向量相近不代表参数相同，只有缓存的项目和指标都出现在当前查询中才复用
+            cached_params = self.semantic_cache.lookup(*cache_key, validator=self._cached_params_match)
+            if cached_params is not None:
+                extracted_params = dict(cached_params)
+                self.conversation_history.append(
+                    {
+                        "role": "system",
+                        "content": f"参数提取完成（语义缓存）: {json.dumps(extracted_params, ensure_ascii=False)}",
+                        "timestamp": datetime.now().isoformat(),
+                    }
+                )
+                return {
+                    "conversation_id": self.conversation_id,
+                    "is_bi_query": True,
+                    "is_complete": True,
+                    "extracted_params": extracted_params,
+                }
+
+        # 意图识别和项目名称提取互不依赖，由阶段调度器并发执行
+        stage_results = await self._run_stages(query_text, context)
+        intent_result = stage_results["intent"]
 
-        # 2. 项目名称提取（无论意图如何，都尝试提取项目名称）
-        projects = await self.project_extractor.extract_projects_async(query_text)
+        # 项目名称提取（无论意图如何，都尝试提取项目名称）
+        projects = stage_results["projects"]
         if projects:
             intent_result["projects"] = projects
 
+        # 使用解析后的日期
+        if stage_results["date"] is not None:
+            intent_result["current_date"] = stage_results["date"]
+
         # 如果不是 BI 查询，直接返回
         if intent_result.get("intent") != "bi_query":
             response = "抱歉，我只能回答 BI 相关的问题。"
@@ -126,7 +196,7 @@ class BIAgent:
                 "is_bi_query": False,
             }
 
-        # 2. 信息收集
+        # 信息收集
         if not intent_result.get("complete", False):
             # 如果信息不完整，收集缺失信息
             collector_result = await self._collect_info_async(
@@ -161,33 +231,23 @@ class BIAgent:
                 },
             }
 
-        # 3. 信息完整，准备调用外部 API
+        # 信息完整，准备调用外部 API
         # 注意：实际的 API 调用由外部实现，这里只返回提取的参数
 
-        # 使用标准指标名称解析器对指标名称进行标准化
+        # 标准指标名称已在调度阶段中并发解析
         original_target_name = intent_result.get("targetName", "")
-        if original_target_name:
-            try:
-                # 异步提取标准指标名称
-                standardized_target_name = (
-                    await self.target_extractor.extract_target_async(
-                        original_target_name
-                    )
-                )
-                if standardized_target_name:
-                    # 如果成功提取到标准指标名称，替换原始指标名称
-                    intent_result["targetName"] = standardized_target_name
-                    # 记录标准化过程
-                    self.conversation_history.append(
-                        {
-                            "role": "system",
-                            "content": f"指标名称标准化: '{original_target_name}' -> '{standardized_target_name}'",
-                            "timestamp": datetime.now().isoformat(),
-                        }
-                    )
-            except Exception as e:
-                # 如果标准化过程出错，使用原始指标名称
-                print(f"Error standardizing target name: {e}")
+        standardized_target_name = stage_results["target"]
+        if standardized_target_name:
+            # 如果成功提取到标准指标名称，替换原始指标名称
+            intent_result["targetName"] = standardized_target_name
+            # 记录标准化过程
+            self.conversation_history.append(
+                {
+                    "role": "system",
+                    "content": f"指标名称标准化: '{original_target_name}' -> '{standardized_target_name}'",
+                    "timestamp": datetime.now().isoformat(),
+                }
+            )
 
         extracted_params = {
             "precinctName": intent_result.get("precinctName"),
@@ -206,6 +266,10 @@ class BIAgent:
             }
         )
 
+        # 写入语义缓存
+        if cache_key is not None:
+            self.semantic_cache.store(*cache_key, dict(extracted_params))
+
         return {
             "conversation_id": self.conversation_id,
             "is_bi_query": True,
@@ -213,6 +277,236 @@ class BIAgent:
             "extracted_params": extracted_params,
         }
 
+    def health(self) -> Dict[str, Any]:
+        """健康检查
+
+        Returns:
+            是否可以提供查询、标准指标索引构建状态和各缓存的统计信息
+        """
+        index_status = self.target_extractor.index_status()
+        return {
+            "ready": index_status["serving"],
+            "target_index": index_status,
+            "target_cache": self.target_extractor.cache_stats(),
+            "semantic_cache": self.semantic_cache.stats() if self.semantic_cache is not None else None,
+        }
+
+    @staticmethod
+    def _cached_params_match(normalized_query: str, cached_params: Dict[str, Any]) -> bool:
+        """检查缓存的项目名称和指标名称是否都出现在当前查询中
+
+        Args:
+            normalized_query: 规范化后的查询文本
+            cached_params: 缓存的参数提取结果
+
+        Returns:
+            是否可以复用缓存结果
+        """
+        projects = [
+            name.strip().lower()
+            for name in (cached_params.get("precinctName") or "").replace("，", ",").split(",")
+            if name.strip()
+        ]
+        target_name = (cached_params.get("targetName") or "").strip().lower()
+        if not projects or not target_name:
+            return False
+        return target_name in normalized_query and all(project in normalized_query for project in projects)
+
+    async def _semantic_cache_key(self, query_text: str) -> Optional[Tuple[str, List[float], str]]:
+        """计算查询的语义缓存键
+
+        上下文键由查询中解析出的日期和项目目录中匹配到的项目组成，
+        查询向量通过标准指标名称解析器共享的向量计算执行器计算，与其他并发查询合并批量计算。
+        查询本身没有日期表达、或项目目录中没有匹配到项目时不使用缓存：
+        此时日期或项目可能来自对话历史，或者只相差一个字的不同项目（如"华东"与"华南"）向量几乎相同，
+        都无法通过上下文键区分。
+
+        Args:
+            query_text: 用户查询文本
+
+        Returns:
+            (规范化查询文本, 查询向量, 上下文键)，未启用缓存或无法确定日期、项目上下文时返回 None
+        """
+        if self.semantic_cache is None:
+            return None
+        date_context = extract_date_context(query_text)
+        if not date_context:
+            return None
+        projects = ",".join(sorted(self.project_extractor.gazetteer.extract(query_text)))
+        if not projects:
+            return None
+        normalized_query = " ".join(query_text.split()).lower()
+        try:
+            embeddings = await self.target_extractor.embedding_executor.embed_async([normalized_query])
+            embedding = embeddings[0]
+        except Exception as e:
+            print(f"Error embedding query for semantic cache: {e}")
+            return None
+        return normalized_query, embedding, f"{date_context}|{projects}"
+
+    async def _run_stages(self, query_text: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """按依赖关系并发执行查询处理阶段
+
+        阶段依赖关系：
+            intent（意图识别） ─┬─> date（日期解析）
+                               └─> target（指标名称标准化）
+            projects（项目名称提取）独立执行
+            target_guess（推测的指标名称标准化，可选）独立执行，意图不是完整的 BI 查询时丢弃
+
+        启用融合提取时，intent 阶段一次调用同时提取项目名称，projects 阶段改为依赖 intent，
+        优先使用项目词典的匹配结果，否则直接采用意图结果中的项目名称，不再单独调用 LLM。
+
+        Args:
+            query_text: 用户查询文本
+            context: 上下文信息
+
+        Returns:
+            各阶段结果，跳过或丢弃的阶段为 None
+        """
+
+        def is_bi_query(results: Dict[str, Any]) -> bool:
+            return results["intent"].get("intent") == "bi_query"
+
+        def is_complete_bi_query(results: Dict[str, Any]) -> bool:
+            return is_bi_query(results) and results["intent"].get("complete", False)
+
+        async def standardize_target(results: Dict[str, Any]) -> Optional[str]:
+            original_target_name = results["intent"]["targetName"]
+            guess = results.get("target_guess")
+            # 推测结果与意图识别出的指标名称一致时直接采用，否则重新标准化
+            if guess and (guess in original_target_name or original_target_name in guess):
+                return guess
+            return await self._standardize_target_async(original_target_name)
+
+        fused_extraction = self._fused_extraction_enabled()
+
+        async def analyze_intent(results: Dict[str, Any]) -> Dict[str, Any]:
+            if fused_extraction:
+                extraction = await self._fused_extract_async(query_text, context)
+                if extraction is not None:
+                    return extraction.to_intent_result()
+            return await self._analyze_intent_async(query_text, context)
+
+        async def extract_projects(results: Dict[str, Any]) -> str:
+            projects = self.project_extractor.gazetteer.extract(query_text)
+            if not projects:
+                precinct_name = results["intent"].get("precinctName") or ""
+                projects = [
+                    normalize_project_name(name)
+                    for name in precinct_name.replace("，", ",").split(",")
+                    if name.strip()
+                ]
+            return ",".join(projects)
+
+        target_deps = ("intent",)
+        scheduler = StageScheduler()
+        scheduler.add_stage("intent", analyze_intent)
+        if fused_extraction:
+            scheduler.add_stage("projects", extract_projects, deps=("intent",))
+        else:
+            scheduler.add_stage(
+                "projects", lambda results: self.project_extractor.extract_projects_async(query_text)
+            )
+        scheduler.add_stage(
+            "date",
+            lambda results: self._parse_date_async(results["intent"]["current_date"]),
+            deps=("intent",),
+            condition=lambda results: is_bi_query(results) and bool(results["intent"].get("current_date")),
+        )
+        if self.speculative_target:
+            # 在意图识别完成前，以整句查询作为推测的指标名称提前开始标准化
+            scheduler.add_stage(
+                "target_guess",
+                lambda results: self._standardize_target_async(query_text),
+                condition=is_complete_bi_query,
+                speculative=True,
+                confirm_after=("intent",),
+            )
+            target_deps = ("intent", "target_guess")
+        scheduler.add_stage(
+            "target",
+            standardize_target,
+            deps=target_deps,
+            condition=lambda results: is_complete_bi_query(results) and bool(results["intent"].get("targetName")),
+        )
+        return await scheduler.run()
+
+    async def _fused_extract_async(self, query_text: str, context: Dict[str, Any]) -> Optional[BIExtraction]:
+        """一次结构化输出调用提取意图、项目、时间和指标
+
+        Args:
+            query_text: 用户查询文本
+            context: 上下文信息
+
+        Returns:
+            融合提取结果，调用失败或输出不符合模式时返回 None
+        """
+        prompt = f"""请解析以下用户查询：
+
+            查询：{query_text}
+
+            上下文：{json.dumps(context, ensure_ascii=False)}
+            """
+        try:
+            return await self.fused_executor.complete_structured(prompt, BIExtraction)
+        except Exception as e:
+            print(f"Error in fused extraction, falling back to staged extraction: {e}")
+            if self._is_structured_output_rejection(e):
+                model_client = self.fused_executor.model_client
+                if model_client not in _structured_output_unsupported:
+                    _structured_output_unsupported.add(model_client)
+                    print("模型服务不支持结构化输出，已对该模型客户端关闭融合提取，后续查询直接使用分阶段提取")
+            return None
+
+    def _fused_extraction_enabled(self) -> bool:
+        """是否对本次查询使用融合提取"""
+        return self.fused_extraction and self.fused_executor.model_client not in _structured_output_unsupported
+
+    @staticmethod
+    def _is_structured_output_rejection(error: Exception) -> bool:
+        """判断融合提取失败是否因为服务不支持结构化输出
+
+        服务以 400 拒绝 json_schema 等 response_format，或忽略格式约束返回不符合模式的内容时视为不支持；
+        超时、限流等临时错误不关闭融合提取。
+        """
+        if isinstance(error, ValidationError):
+            return True
+        if getattr(error, "status_code", None) == 400:
+            message = str(error).lower()
+            return any(keyword in message for keyword in ("response_format", "json_schema", "structured"))
+        return False
+
+    async def _parse_date_async(self, date_text: str) -> Any:
+        """异步解析日期字符串，解析失败时返回原始字符串
+
+        Args:
+            date_text: 日期字符串
+
+        Returns:
+            解析后的日期
+        """
+        try:
+            return await self.date_parser.parse_date_async(date_text)
+        except Exception as e:
+            print(f"Error parsing date: {e}")
+            return date_text
+
+    async def _standardize_target_async(self, target_name: str) -> Optional[str]:
+        """异步标准化指标名称，失败时返回 None
+
+        Args:
+            target_name: 原始指标名称
+
+        Returns:
+            标准指标名称
+        """
+        try:
+            return await self.target_extractor.extract_target_async(target_name)
+        except Exception as e:
+            # 如果标准化过程出错，使用原始指标名称
+            print(f"Error standardizing target name: {e}")
+            return None
+
     def process_query(self, query_text: str) -> Dict[str, Any]:
         """同步处理用户查询（兼容旧版接口）
 
@@ -223,7 +517,7 @@ class BIAgent:
             处理结果
         """
         # 使用事件循环运行异步方法
-        return asyncio.run(self.process_query_async(query_text))
+        return run_sync(self.process_query_async(query_text))
 
     async def _analyze_intent_async(
         self, query_text: str, context: Dict[str, Any]
@@ -247,30 +541,8 @@ class BIAgent:
             请判断这是否是一个指标数据查询，如果是，请提取关键信息。
             """
 
-        # 根据配置选择使用流式或非流式模式
-        if self.use_stream_mode:
-            print("[意图识别] 使用流式模式...")
-
-            # 准备流式输出生成器
-            stream_generator = self.intent_agent.run_stream(task=prompt)
-
-            # 使用 Console 类处理流式输出并获取结果，无论是否打印
-            if self.print_stream_output:
-                print("[意图识别] 流式输出开始:")
-                # 显示消息
-                result = await Console(stream_generator, output_stats=True)
-            else:
-                # 不显示消息，但仍然使用 Console 处理流式输出
-                result = await Console(stream_generator, output_stats=False)
-
-            # 从结果中获取最后一条消息的内容
-            response = result.messages[-1].content
-        else:
-            print("[意图识别] 使用非流式模式...")
-            # 使用传统的 run 方法
-            result = await self.intent_agent.run(task=prompt)
-            # 从 TaskResult 对象中获取最后一次响应内容
-            response = result.messages[-1].content
+        # 意图识别是单轮无状态调用（对话历史已包含在上下文中），直接调用模型客户端
+        response = await self.intent_executor.complete(prompt)
         # 解析响应
         try:
             # 尝试从响应中提取 JSON
@@ -285,17 +557,11 @@ class BIAgent:
                 # 如果没有找到 JSON 格式，尝试直接解析整个响应
                 intent_result = json.loads(response)
 
-            # 处理日期信息
-            if "current_date" in intent_result and intent_result["current_date"]:
-                # 使用日期解析器解析日期字符串
-                parsed_date = await self.date_parser.parse_date_async(
-                    intent_result["current_date"]
-                )
-                intent_result["current_date"] = parsed_date
-
+            # 日期信息由调度器中的日期解析阶段处理
             return intent_result
         except Exception as e:
             # 如果解析失败，返回默认结果
+            print(f"Error parsing intent response: {e}")
             return {
                 "intent": "other",
                 "complete": False,
@@ -325,30 +591,15 @@ class BIAgent:
         请帮助收集缺失的信息，并生成合适的提问。
         """
 
-        # 根据配置选择使用流式或非流式模式
-        if self.use_stream_mode:
-            print("[信息收集] 使用流式模式...")
-
-            # 准备流式输出生成器
-            stream_generator = self.collector_agent.run_stream(task=prompt)
-
-            # 使用 Console 类处理流式输出并获取结果，无论是否打印
-            if self.print_stream_output:
-                print("[信息收集] 流式输出开始:")
-                # 显示消息
-                result = await Console(stream_generator, output_stats=True)
-            else:
-                # 不显示消息，但仍然使用 Console 处理流式输出
-                result = await Console(stream_generator, output_stats=False)
-
-            # 从结果中获取最后一条消息的内容
-            response = result.messages[-1].content
+        # 信息收集需要保留多轮上下文，仍使用智能体；流式模式由智能体的 model_client_stream 控制
+        if self.print_stream_output:
+            print("[信息收集] 流式输出开始:")
+            result = await Console(self.collector_agent.run_stream(task=prompt), output_stats=True)
         else:
-            print("[信息收集] 使用非流式模式...")
-            # 使用传统的 run 方法
             result = await self.collector_agent.run(task=prompt)
-            # 从 TaskResult 对象中获取最后一次响应内容
-            response = result.messages[-1].content
+
+        # 从 TaskResult 对象中获取最后一次响应内容
+        response = result.messages[-1].content
 
         return {
             "response": response,
@@ -369,7 +620,7 @@ class BIAgent:
         Returns:
             收集结果
         """
-        return asyncio.run(
+        return run_sync(
             self._collect_info_async(query_text, missing_info, collected_info)
         )
 
@@ -4,7 +4,8 @@
 
 from typing import Dict, Any, List
 from autogen_agentchat.agents import AssistantAgent
-from autogen_ext.models.openai import OpenAIChatCompletionClient
+
+from autogenchat_bi.utils.completion import get_model_client
 
 
 class CollectorAgent(AssistantAgent):
@@ -30,16 +31,10 @@ DEFAULT_COLLECTOR_SYSTEM_MESSAGE = """你是一个专业的信息收集智能体
 
 def create_collector_agent(llm_config: Dict[str, Any], use_stream_mode: bool = False) -> CollectorAgent:
     """创建信息收集智能体实例"""
-    # 创建模型客户端
+    # 使用进程内共享的模型客户端，智能体自身的对话上下文仍按实例保存
     # 百炼 API 需要流式模式，但我们不能直接设置 stream=True
     # 我们需要在 create 方法调用时设置流式模式
-    model_client = OpenAIChatCompletionClient(
-        model=llm_config.get("model", "gpt-4o"),
-        api_key=llm_config.get("api_key"),
-        base_url=llm_config.get("base_url"),
-        temperature=llm_config.get("temperature", 0.0),
-        model_info=llm_config.get("model_info"),
-    )
+    model_client = get_model_client(llm_config)
 
     return CollectorAgent(
         name="collector_agent",
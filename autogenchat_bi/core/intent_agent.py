@@ -2,10 +2,12 @@
 意图识别智能体模块
 """
 
-from typing import Dict, Any
+from typing import Dict, Any, List, Literal
 from autogen_agentchat.agents import AssistantAgent
 from autogen_core.models import ModelFamily
-from autogen_ext.models.openai import OpenAIChatCompletionClient
+from pydantic import BaseModel, Field
+
+from autogenchat_bi.utils.completion import CompletionExecutor, get_model_client
 
 class IntentAgent(AssistantAgent):
     """意图识别智能体"""
@@ -34,24 +36,21 @@ DEFAULT_INTENT_SYSTEM_MESSAGE = """你是一个专业的意图识别智能体，
 ```
 """
 
+# 意图识别模型能力信息，启用结构化输出
+INTENT_MODEL_INFO = {
+    "vision": True,
+    "function_calling": True,
+    "json_output": True,
+    "family": ModelFamily.ANY,
+    "structured_output": True,
+}
+
 def create_intent_agent(llm_config: Dict[str, Any], use_stream_mode: bool = False) -> IntentAgent:
     """创建意图识别智能体实例"""
     # 创建模型客户端
     # 百炼 API 需要流式模式，但我们不能直接设置 stream=True
     # 我们需要在 create 方法调用时设置流式模式
-    model_client = OpenAIChatCompletionClient(
-        model=llm_config.get("model", "gpt-4o"),
-        api_key=llm_config.get("api_key"),
-        base_url=llm_config.get("base_url"),
-        temperature=llm_config.get("temperature", 0.0),
-        model_info={
-            "vision": True,
-            "function_calling": True,
-            "json_output": True,
-            "family": ModelFamily.ANY,
-            "structured_output": True,
-        },
-    )
+    model_client = get_model_client(llm_config, model_info=INTENT_MODEL_INFO)
 
     return IntentAgent(
         name="intent_agent",
@@ -60,3 +59,73 @@ def create_intent_agent(llm_config: Dict[str, Any], use_stream_mode: bool = Fals
         model_client=model_client,
         model_client_stream=use_stream_mode,
     )
+
+
+def create_intent_executor(
+    llm_config: Dict[str, Any], use_stream_mode: bool = False, print_stream_output: bool = False
+) -> CompletionExecutor:
+    """创建意图识别执行器实例
+
+    意图识别是单轮无状态的提取任务，直接调用模型客户端，无需创建智能体
+    """
+    return CompletionExecutor(
+        name="意图识别",
+        model_client=get_model_client(llm_config, model_info=INTENT_MODEL_INFO),
+        system_message=DEFAULT_INTENT_SYSTEM_MESSAGE,
+        use_stream_mode=use_stream_mode,
+        print_stream_output=print_stream_output,
+    )
+
+
+class BIExtraction(BaseModel):
+    """融合提取结果：一次调用同时返回意图、项目、原始日期表达和指标名称"""
+
+    intent: Literal["bi_query", "other"] = Field(description="是否为指标数据查询")
+    complete: bool = Field(description="项目、时间、指标信息是否齐全")
+    missing_info: List[str] = Field(default_factory=list, description="缺失的信息：项目、时间、指标")
+    projects: List[str] = Field(
+        default_factory=list, description="项目名称列表，不包含\"项目\"、\"物业\"字样，遵循最小描述原则"
+    )
+    date_text: str = Field(default="", description="查询中的原始时间表达，如\"2024年\"、\"上个季度\"")
+    target_name: str = Field(default="", description="查询中的指标名称")
+
+    def to_intent_result(self) -> Dict[str, Any]:
+        """转换为与意图识别输出格式一致的字典"""
+        return {
+            "intent": self.intent,
+            "complete": self.complete,
+            "missing_info": self.missing_info,
+            "precinctName": ",".join(self.projects),
+            "current_date": self.date_text,
+            "targetName": self.target_name,
+        }
+
+
+FUSED_EXTRACTION_SYSTEM_MESSAGE = """你是一个 BI 查询解析器，一次性从用户查询中提取全部关键信息。
+
+1. intent：判断是否为指标数据查询，是则为 "bi_query"，否则为 "other"
+2. projects：提取所有项目名称，去除"项目"、"物业"字样，遵循最小描述原则
+   - 例如："华东物业的2024年收缴率是多少" -> ["华东"]；"成都高新园区和天府新区的收入情况" -> ["成都高新", "天府新区"]
+3. date_text：原样摘录查询中的时间表达，不要换算，如"2024年"、"上半年"、"近五年"
+4. target_name：提取查询中的指标名称，如"物业费收缴率"
+5. complete：项目、时间、指标三项都存在时为 true
+6. missing_info：列出缺失的信息，取值为"项目"、"时间"、"指标"
+
+结合上下文中的对话历史补全当前查询省略的信息。只按照给定的 JSON 模式输出。
+"""
+
+
+def create_fused_extraction_executor(
+    llm_config: Dict[str, Any], use_stream_mode: bool = False, print_stream_output: bool = False
+) -> CompletionExecutor:
+    """创建融合提取执行器实例
+
+    使用模型的结构化输出能力，一次调用返回符合 BIExtraction 模式的结果
+    """
+    return CompletionExecutor(
+        name="融合提取",
+        model_client=get_model_client(llm_config, model_info=INTENT_MODEL_INFO),
+        system_message=FUSED_EXTRACTION_SYSTEM_MESSAGE,
+        use_stream_mode=use_stream_mode,
+        print_stream_output=print_stream_output,
+    )
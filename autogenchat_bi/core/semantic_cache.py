@@ -0,0 +1,145 @@
+"""
+语义结果缓存模块
+按查询向量的余弦相似度复用 BI 查询的参数提取结果
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+@dataclass
+class _CacheEntry:
+    """缓存条目"""
+
+    embedding: np.ndarray
+    value: Dict[str, Any]
+    created_at: float
+
+
+class SemanticCache:
+    """语义结果缓存
+
+    缓存条目按上下文键（解析后的日期、已识别的项目等）分组，只有上下文键完全相同、
+    且查询向量余弦相似度不低于阈值的查询才会命中，避免 "2024年" 与 "2023年"
+    这类向量相近但参数不同的查询相互复用。
+    条目超过存活时间后失效，超过容量时按最近最少使用淘汰。
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl: int = 3600, max_size: int = 1000):
+        """初始化语义结果缓存
+
+        Args:
+            threshold: 命中所需的最小余弦相似度
+            ttl: 缓存存活时间（秒）
+            max_size: 最大缓存条目数
+        """
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, str], _CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        """归一化向量，使点积等于余弦相似度"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(
+        self,
+        query: str,
+        embedding: Sequence[float],
+        context_key: str,
+        validator: Optional[Callable[[str, Dict[str, Any]], bool]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """查找语义相近的缓存结果
+
+        Args:
+            query: 规范化后的查询文本
+            embedding: 查询向量
+            context_key: 上下文键
+            validator: 校验函数，接收查询文本和缓存结果，返回 False 的条目不会命中，按未命中统计
+
+        Returns:
+            命中时返回缓存结果，否则返回 None
+        """
+        vector = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            best_key, best_score = None, self.threshold
+            for key, entry in list(self._entries.items()):
+                if now - entry.created_at >= self.ttl:
+                    del self._entries[key]
+                    continue
+                if key[0] != context_key:
+                    continue
+                # 查询文本完全相同时直接命中
+                score = 1.0 if key[1] == query else float(np.dot(vector, entry.embedding))
+                if score >= best_score and (validator is None or validator(query, entry.value)):
+                    best_key, best_score = key, score
+
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return self._entries[best_key].value
+
+    def store(self, query: str, embedding: Sequence[float], context_key: str, value: Dict[str, Any]) -> None:
+        """写入缓存结果
+
+        Args:
+            query: 规范化后的查询文本
+            embedding: 查询向量
+            context_key: 上下文键
+            value: 缓存结果
+        """
+        key = (context_key, query)
+        with self._lock:
+            self._entries[key] = _CacheEntry(self._normalize(embedding), value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息
+
+        Returns:
+            包含命中次数、未命中次数、命中率和当前条目数的字典
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._entries),
+        }
+
+
+# 进程级语义结果缓存，在多个 BIAgent 实例之间共享
+_semantic_cache: Optional[SemanticCache] = None
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache(threshold: float = 0.95, ttl: int = 3600, max_size: int = 1000) -> SemanticCache:
+    """获取进程级语义结果缓存，首次调用时按参数创建"""
+    global _semantic_cache
+    with _semantic_cache_lock:
+        if _semantic_cache is None:
+            _semantic_cache = SemanticCache(threshold=threshold, ttl=ttl, max_size=max_size)
+        return _semantic_cache
+
+
+__all__ = ["SemanticCache", "get_semantic_cache"]
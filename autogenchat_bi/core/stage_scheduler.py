@@ -0,0 +1,153 @@
+"""
+阶段调度器模块
+按依赖关系并发执行 BI 查询流程中的各个阶段，支持推测执行
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# 阶段函数接收已完成阶段的结果字典，返回本阶段结果
+StageFunc = Callable[[Dict[str, Any]], Awaitable[Any]]
+# 阶段条件接收已完成阶段的结果字典，返回是否需要（或保留）本阶段
+StageCondition = Callable[[Dict[str, Any]], bool]
+
+
+@dataclass
+class Stage:
+    """调度阶段
+
+    Attributes:
+        name: 阶段名称
+        func: 阶段函数
+        deps: 依赖的阶段名称，全部完成后本阶段才能开始
+        condition: 阶段条件，不满足时本阶段结果为 None
+        speculative: 是否推测执行。推测阶段在依赖完成后立即开始，
+            待 confirm_after 中的阶段完成后再判断条件，不满足则取消并丢弃结果
+        confirm_after: 推测阶段判断条件前需要等待完成的阶段
+    """
+
+    name: str
+    func: StageFunc
+    deps: Tuple[str, ...] = ()
+    condition: Optional[StageCondition] = None
+    speculative: bool = False
+    confirm_after: Tuple[str, ...] = ()
+
+
+class StageScheduler:
+    """基于有向无环图的阶段调度器
+
+    每个阶段在其依赖全部完成后立即启动，相互独立的阶段（如多个 LLM 调用）
+    并发执行，端到端耗时由各阶段耗时之和降为关键路径耗时。
+    """
+
+    def __init__(self):
+        """初始化阶段调度器"""
+        self._stages: Dict[str, Stage] = {}
+
+    def add_stage(
+        self,
+        name: str,
+        func: StageFunc,
+        deps: Tuple[str, ...] = (),
+        condition: Optional[StageCondition] = None,
+        speculative: bool = False,
+        confirm_after: Tuple[str, ...] = (),
+    ) -> "StageScheduler":
+        """添加阶段
+
+        Args:
+            name: 阶段名称
+            func: 阶段函数，参数为已完成阶段的结果字典
+            deps: 依赖的阶段名称
+            condition: 阶段条件。普通阶段在依赖完成后判断，推测阶段在 confirm_after 完成后判断
+            speculative: 是否推测执行
+            confirm_after: 推测阶段判断条件前需要等待完成的阶段
+
+        Returns:
+            调度器本身，便于链式调用
+        """
+        if name in self._stages:
+            raise ValueError(f"阶段已存在: {name}")
+        self._stages[name] = Stage(
+            name=name,
+            func=func,
+            deps=tuple(deps),
+            condition=condition,
+            speculative=speculative,
+            confirm_after=tuple(confirm_after),
+        )
+        return self
+
+    def _confirmable(self, stage: Stage, results: Dict[str, Any]) -> bool:
+        """推测阶段的条件是否已经可以判断"""
+        return all(name in results for name in stage.confirm_after)
+
+    async def run(self) -> Dict[str, Any]:
+        """执行所有阶段
+
+        Returns:
+            各阶段结果，被跳过或丢弃的阶段结果为 None
+        """
+        for stage in self._stages.values():
+            unknown = [d for d in stage.deps + stage.confirm_after if d not in self._stages]
+            if unknown:
+                raise ValueError(f"阶段 {stage.name} 依赖未知阶段: {', '.join(unknown)}")
+
+        results: Dict[str, Any] = {}
+        pending = dict(self._stages)
+        running: Dict[str, asyncio.Task] = {}
+
+        try:
+            while pending or running:
+                # 启动依赖已满足的阶段；跳过的阶段也会产生结果，因此循环直到没有变化
+                changed = True
+                while changed:
+                    changed = False
+                    for name, stage in list(pending.items()):
+                        if not all(d in results for d in stage.deps):
+                            continue
+                        del pending[name]
+                        changed = True
+                        if (
+                            stage.condition is not None
+                            and (not stage.speculative or self._confirmable(stage, results))
+                            and not stage.condition(results)
+                        ):
+                            results[name] = None
+                            continue
+                        running[name] = asyncio.create_task(stage.func(dict(results)))
+
+                # 条件已可判断且不满足的推测阶段，取消并丢弃结果
+                for name, task in list(running.items()):
+                    stage = self._stages[name]
+                    if (
+                        stage.speculative
+                        and stage.condition is not None
+                        and self._confirmable(stage, results)
+                        and not stage.condition(results)
+                    ):
+                        task.cancel()
+                        del running[name]
+                        results[name] = None
+
+                if not running:
+                    if pending:
+                        raise ValueError(f"阶段存在循环依赖: {', '.join(pending)}")
+                    break
+
+                done, _ = await asyncio.wait(running.values(), return_when=asyncio.FIRST_COMPLETED)
+                for name, task in list(running.items()):
+                    if task in done:
+                        del running[name]
+                        results[name] = task.result()
+        finally:
+            for task in running.values():
+                task.cancel()
+
+        # 推测阶段先于其条件依赖完成时，在最后统一判断是否保留结果
+        for name, stage in self._stages.items():
+            if stage.speculative and stage.condition is not None and not stage.condition(results):
+                results[name] = None
+
+        return results
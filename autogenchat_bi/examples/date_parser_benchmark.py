@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+日期规则解析基准示例
+使用固定的当前时间校验规则解析语料，并统计单次解析耗时
+"""
+
+import argparse
+import time
+from datetime import datetime
+
+from autogenchat_bi.utils.relative_date import parse_relative_date
+
+# 固定当前时间，保证语料的期望结果稳定
+NOW = datetime(2025, 4, 15, 10, 0, 0)
+
+# 语料：(日期表达, 期望结果)，期望结果为 None 表示规则无法解析、需要回退到大语言模型
+CORPUS = [
+    ("2024年", "2024"),
+    ("2024", "2024"),
+    ("2024年度", "2024"),
+    ("2024年全年", "2024"),
+    ("2024年和2023年", "2023,2024"),
+    ("2023-2025年", "2023,2024,2025"),
+    ("今年", "2025"),
+    ("去年", "2024"),
+    ("前年和去年", "2023,2024"),
+    ("明年", "2026"),
+    ("上半年", "2025-01,2025-02,2025-03,2025-04,2025-05,2025-06"),
+    ("去年下半年", "2024-07,2024-08,2024-09,2024-10,2024-11,2024-12"),
+    ("2024年的上半年", "2024-01,2024-02,2024-03,2024-04,2024-05,2024-06"),
+    ("上个季度", "2025-01,2025-02,2025-03"),
+    ("本季度", "2025-04,2025-05,2025-06"),
+    ("下季度", "2025-07,2025-08,2025-09"),
+    ("2024年第一季度", "2024-01,2024-02,2024-03"),
+    ("2024年Q3", "2024-07,2024-08,2024-09"),
+    ("一季度和二季度", "2025-01,2025-02,2025-03,2025-04,2025-05,2025-06"),
+    ("本月", "2025-04"),
+    ("本月20日", "2025-04"),
+    ("上个月", "2025-03"),
+    ("上月", "2025-03"),
+    ("下个月", "2025-05"),
+    ("3月份", "2025-03"),
+    ("2024年3月", "2024-03"),
+    ("去年12月", "2024-12"),
+    ("2024-03", "2024-03"),
+    ("2024年1-3月", "2024-01,2024-02,2024-03"),
+    ("2024年1月到3月", "2024-01,2024-02,2024-03"),
+    ("2023年11月至2024年2月", "2023-11,2023-12,2024-01,2024-02"),
+    # 省略年份的后续表达沿用前面明确指定的年份
+    ("2024年3月和4月", "2024-03,2024-04"),
+    ("2024年上半年和下半年", "2024-01,2024-02,2024-03,2024-04,2024-05,2024-06,"
+                           "2024-07,2024-08,2024-09,2024-10,2024-11,2024-12"),
+    ("2024年一季度和二季度", "2024-01,2024-02,2024-03,2024-04,2024-05,2024-06"),
+    ("去年1月、2月", "2024-01,2024-02"),
+    ("近五年", "2021,2022,2023,2024,2025"),
+    ("近两年", "2024,2025"),
+    ("最近3年", "2023,2024,2025"),
+    ("近三个月", "2025-02,2025-03,2025-04"),
+    ("过去十二个月", "2024-05,2024-06,2024-07,2024-08,2024-09,2024-10,"
+                    "2024-11,2024-12,2025-01,2025-02,2025-03,2025-04"),
+    ("今年以来", "2025-01,2025-02,2025-03,2025-04"),
+    ("年初至今", "2025-01,2025-02,2025-03,2025-04"),
+    ("春节期间", None),
+    ("去年同期", None),
+    ("国庆假期", None),
+    ("13月", None),
+]
+
+
+def check_corpus() -> int:
+    """校验语料，返回不符合期望的条数"""
+    failures = 0
+    for text, expected in CORPUS:
+        actual = parse_relative_date(text, NOW)
+        status = "✓" if actual == expected else "✗"
+        if actual != expected:
+            failures += 1
+        print(f"{status} {text!r:<28} -> {actual}" + ("" if actual == expected else f"（期望 {expected}）"))
+    return failures
+
+
+def benchmark(rounds: int) -> None:
+    """统计规则解析的单次平均耗时"""
+    texts = [text for text, _ in CORPUS]
+    started_at = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            parse_relative_date(text, NOW)
+    elapsed = time.perf_counter() - started_at
+    calls = rounds * len(texts)
+    hits = sum(1 for _, expected in CORPUS if expected is not None)
+    print(f"\n规则命中率: {hits}/{len(CORPUS)}（其余回退到大语言模型）")
+    print(f"解析 {calls} 次，总耗时 {elapsed:.3f} 秒，平均 {elapsed / calls * 1e6:.1f} 微秒/次")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="日期规则解析基准")
+    parser.add_argument("--rounds", type=int, default=1000, help="基准测试轮数")
+    args = parser.parse_args()
+
+    failures = check_corpus()
+    benchmark(args.rounds)
+    if failures:
+        raise SystemExit(f"{failures} 条语料解析结果不符合期望")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+向量模型推理后端基准示例
+在标准指标文档上比较 torch、onnx、onnx-int8 后端的加载耗时、查询延迟、内存占用和召回率
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import statistics
+import time
+from typing import Any, Dict, List, Tuple
+
+from autogenchat_bi.utils.metric_embeddings import MetricEmbeddingMatrix
+from autogenchat_bi.utils.metric_index import extract_metric_names
+from autogenchat_bi.utils.resources import DEFAULT_EMBEDDING_MODEL, EMBEDDING_BACKENDS
+
+DEFAULT_DOCS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "target-docs")
+
+
+def load_corpus(docs_dir: str) -> Tuple[Dict[str, List[str]], List[Tuple[str, str]]]:
+    """加载标准指标词表，以别名作为查询、所属标准指标作为期望结果
+
+    Returns:
+        (标准指标名称到别名列表的映射, (查询, 期望的标准指标名称) 列表)
+    """
+    metrics: Dict[str, List[str]] = {}
+    for filename in sorted(os.listdir(docs_dir)):
+        if filename.endswith(".md"):
+            with open(os.path.join(docs_dir, filename), "r", encoding="utf-8") as f:
+                for name, aliases in extract_metric_names(f.read()).items():
+                    metrics.setdefault(name, []).extend(aliases)
+    queries = [(alias, name) for name, aliases in metrics.items() for alias in aliases]
+    return metrics, queries
+
+
+def run_backend(backend: str, docs_dir: str, rounds: int, top_k: int) -> Dict[str, Any]:
+    """在独立进程中测试单个后端，避免不同后端的模型互相影响内存占用"""
+    from autogenchat_bi.utils.resources import get_embedding_function
+
+    metrics, queries = load_corpus(docs_dir)
+    names = list(metrics)
+
+    started_at = time.perf_counter()
+    embedding_function = get_embedding_function(DEFAULT_EMBEDDING_MODEL, backend)
+    embedding_function(["预热"])
+    load_seconds = time.perf_counter() - started_at
+
+    # 只用标准指标名称建立矩阵，别名作为查询检验召回
+    matrix = MetricEmbeddingMatrix(names, MetricEmbeddingMatrix._normalize(embedding_function(names)))
+    query_texts = [query for query, _ in queries]
+
+    latencies = []
+    for _ in range(rounds):
+        for text in query_texts:
+            query_started_at = time.perf_counter()
+            embedding_function([text])
+            latencies.append(time.perf_counter() - query_started_at)
+
+    batch_started_at = time.perf_counter()
+    query_vectors = embedding_function(query_texts)
+    batch_seconds = time.perf_counter() - batch_started_at
+
+    results = matrix.search(query_vectors, top_k)
+    hits_at_1 = sum(1 for (_, expected), ranked in zip(queries, results) if ranked and ranked[0][0] == expected)
+    hits_at_k = sum(1 for (_, expected), ranked in zip(queries, results) if expected in [n for n, _ in ranked])
+
+    return {
+        "backend": backend,
+        "load_seconds": load_seconds,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p95_ms": sorted(latencies)[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0,
+        "batch_qps": len(query_texts) / batch_seconds if batch_seconds else 0.0,
+        # Linux 下 ru_maxrss 的单位为 KB
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "recall_at_1": hits_at_1 / len(queries) if queries else 0.0,
+        "recall_at_k": hits_at_k / len(queries) if queries else 0.0,
+        "vectors": [[float(value) for value in vector] for vector in query_vectors],
+    }
+
+
+def cosine(a: List[float], b: List[float]) -> float:
+    """余弦相似度"""
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = (sum(x * x for x in a) * sum(y * y for y in b)) ** 0.5
+    return dot / norm if norm else 0.0
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="向量模型推理后端基准")
+    parser.add_argument("--docs-dir", default=DEFAULT_DOCS_DIR, help="标准指标文档目录")
+    parser.add_argument("--backends", default=",".join(EMBEDDING_BACKENDS), help="逗号分隔的推理后端")
+    parser.add_argument("--rounds", type=int, default=3, help="单条查询延迟测试轮数")
+    parser.add_argument("--top-k", type=int, default=3, help="召回率统计的候选数量")
+    args = parser.parse_args()
+
+    _, queries = load_corpus(args.docs_dir)
+    if not queries:
+        raise SystemExit(f"{args.docs_dir} 中没有找到带别名的标准指标（\"标准指标：\"、\"别名：\" 行）")
+    print(f"标准指标别名查询: {len(queries)} 条")
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for backend in args.backends.split(","):
+        with context.Pool(1) as pool:
+            results.append(pool.apply(run_backend, (backend.strip(), args.docs_dir, args.rounds, args.top_k)))
+
+    # 以第一个后端为基准，统计向量一致性（平均余弦相似度），判断能否复用已有索引
+    baseline = results[0]["vectors"]
+    print(
+        f"\n{'后端':<10} {'加载(s)':>8} {'p50(ms)':>8} {'p95(ms)':>8} {'批量QPS':>9} "
+        f"{'RSS(MB)':>8} {'R@1':>6} {f'R@{args.top_k}':>6} {'一致性':>7}"
+    )
+    for result in results:
+        agreement = statistics.mean(cosine(a, b) for a, b in zip(baseline, result["vectors"]))
+        print(
+            f"{result['backend']:<10} {result['load_seconds']:>8.2f} {result['p50_ms']:>8.2f} "
+            f"{result['p95_ms']:>8.2f} {result['batch_qps']:>9.1f} {result['max_rss_mb']:>8.1f} "
+            f"{result['recall_at_1']:>6.2%} {result['recall_at_k']:>6.2%} {agreement:>7.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
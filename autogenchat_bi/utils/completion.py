@@ -0,0 +1,162 @@
+"""
+补全执行器模块
+直接调用模型客户端完成单轮无状态的提取任务，无需创建智能体
+"""
+import json
+import re
+import threading
+from typing import Any, Dict, Optional, Type, TypeVar
+
+from autogen_core.models import ChatCompletionClient, CreateResult, SystemMessage, UserMessage
+from autogen_ext.models.openai import OpenAIChatCompletionClient
+from pydantic import BaseModel
+
+SchemaT = TypeVar("SchemaT", bound=BaseModel)
+
+# 进程级模型客户端，按模型配置共享
+_model_clients: Dict[str, OpenAIChatCompletionClient] = {}
+_model_clients_lock = threading.Lock()
+
+
+def create_model_client(
+    llm_config: Dict[str, Any], model_info: Optional[Dict[str, Any]] = None
+) -> OpenAIChatCompletionClient:
+    """根据语言模型配置创建模型客户端
+
+    Args:
+        llm_config: 语言模型配置，包含API密钥、基础URL等
+        model_info: 模型能力信息，默认读取配置中的 model_info
+
+    Returns:
+        模型客户端
+    """
+    return OpenAIChatCompletionClient(
+        model=llm_config.get("model", "gpt-4o"),
+        api_key=llm_config.get("api_key"),
+        base_url=llm_config.get("base_url"),
+        temperature=llm_config.get("temperature", 0.0),
+        model_info=model_info or llm_config.get("model_info"),
+    )
+
+
+def get_model_client(
+    llm_config: Dict[str, Any], model_info: Optional[Dict[str, Any]] = None
+) -> OpenAIChatCompletionClient:
+    """获取进程内共享的模型客户端，相同模型配置首次获取时创建
+
+    模型客户端无状态，日期、项目、意图、指标等执行器和智能体共用同一个客户端及其连接池，
+    避免每个 BIAgent 实例重复创建客户端。
+
+    Args:
+        llm_config: 语言模型配置，包含API密钥、基础URL等
+        model_info: 模型能力信息，默认读取配置中的 model_info
+
+    Returns:
+        共享的模型客户端
+    """
+    model_info = model_info or llm_config.get("model_info")
+    key = json.dumps(
+        [
+            llm_config.get("model", "gpt-4o"),
+            llm_config.get("api_key"),
+            llm_config.get("base_url"),
+            llm_config.get("temperature", 0.0),
+            model_info,
+        ],
+        sort_keys=True,
+        default=str,
+    )
+    with _model_clients_lock:
+        client = _model_clients.get(key)
+        if client is None:
+            client = create_model_client(llm_config, model_info=model_info)
+            _model_clients[key] = client
+        return client
+
+
+class CompletionExecutor:
+    """补全执行器
+
+    用固定的系统提示词和单条用户消息直接调用模型客户端的 create/create_stream，
+    收集结果文本返回。每次调用互不影响，可在多个协程间并发使用，
+    适用于项目、日期、指标等单轮提取任务；需要多轮上下文的场景仍使用智能体。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model_client: ChatCompletionClient,
+        system_message: str,
+        use_stream_mode: bool = True,
+        print_stream_output: bool = False,
+    ):
+        """初始化补全执行器
+
+        Args:
+            name: 执行器名称，用于日志输出
+            model_client: 模型客户端
+            system_message: 系统提示词
+            use_stream_mode: 是否使用流式模式，百炼等服务只支持流式调用
+            print_stream_output: 是否打印流式输出
+        """
+        self.name = name
+        self.model_client = model_client
+        self.system_message = system_message
+        self.use_stream_mode = use_stream_mode
+        self.print_stream_output = print_stream_output
+
+    async def complete(self, prompt: str, **create_args: Any) -> str:
+        """执行一次补全
+
+        Args:
+            prompt: 用户提示词
+            **create_args: 传递给模型客户端的其他参数，如 json_output
+
+        Returns:
+            去除首尾空白的回复文本
+        """
+        messages = [
+            SystemMessage(content=self.system_message),
+            UserMessage(content=prompt, source="user"),
+        ]
+
+        if self.use_stream_mode:
+            chunks = []
+            result: Optional[CreateResult] = None
+            if self.print_stream_output:
+                print(f"[{self.name}] 流式输出开始:")
+            async for item in self.model_client.create_stream(messages, **create_args):
+                if isinstance(item, CreateResult):
+                    result = item
+                else:
+                    chunks.append(item)
+                    if self.print_stream_output:
+                        print(item, end="", flush=True)
+            if self.print_stream_output:
+                print()
+            content = result.content if result is not None else "".join(chunks)
+        else:
+            result = await self.model_client.create(messages, **create_args)
+            content = result.content
+
+        return content.strip() if isinstance(content, str) else str(content)
+
+    async def complete_structured(self, prompt: str, schema: Type[SchemaT]) -> SchemaT:
+        """按 Pydantic 模式执行一次结构化输出补全
+
+        使用模型的结构化输出能力约束回复格式，回复不符合模式时抛出 pydantic.ValidationError。
+
+        Args:
+            prompt: 用户提示词
+            schema: 回复需要符合的 Pydantic 模型
+
+        Returns:
+            解析后的模型实例
+        """
+        response = await self.complete(prompt, json_output=schema)
+        # 兼容仍然返回 ```json 代码块的服务
+        fenced = re.search(r"```(?:json)?\s*(.+?)\s*```", response, re.DOTALL)
+        return schema.model_validate_json(fenced.group(1) if fenced else response)
+
+
+__all__ = ["CompletionExecutor", "create_model_client", "get_model_client"]
@@ -2,11 +2,13 @@
 日期解析工具模块
 提供高级日期字符串解析功能，支持相对时间表达
 """
-from autogen_agentchat.agents import AssistantAgent
-
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 
+from autogenchat_bi.utils.completion import CompletionExecutor, get_model_client
+from autogenchat_bi.utils.event_loop import run_sync
+from autogenchat_bi.utils.relative_date import parse_relative_date
+
 class DateParser:
     """日期解析器"""
 
@@ -17,10 +19,11 @@ class DateParser:
             llm_config: 语言模型配置
         """
         self.llm_config = llm_config
+        self.use_stream_mode = llm_config.get("use_stream_mode", True)
 
-        # 创建日期解析智能体
-        self.date_agent = AssistantAgent(
-            name="date_parser",
+        # 创建日期解析执行器，仅用于规则无法解析的日期表达（单轮无状态调用，无需智能体）
+        self.date_executor = CompletionExecutor(
+            name="日期解析",
             system_message="""你是一个高级语义分析和日期格式化专家，负责识别文本中的日期信息。
 
 你的技能包括识别和计算相对时间表达，并将其转换为 `yyyy` 或 `yyyy-MM` 格式（年或年-月）。
@@ -36,14 +39,18 @@ class DateParser:
 
 只返回日期字符串，不要包含任何其他解释或文本。
 """,
-            llm_config=self.llm_config,
-            description="日期解析智能体",
+            model_client=get_model_client(llm_config),
+            use_stream_mode=self.use_stream_mode,
+            print_stream_output=llm_config.get("print_stream_output", False),
         )
 
-    def parse_date(
+    async def parse_date_async(
         self, text: str, current_time: Optional[datetime] = None
     ) -> str:
-        """解析文本中的日期表达
+        """异步解析文本中的日期表达
+
+        先使用规则解析常见的日期表达（如 "2024年"、"上半年"、"上个季度"、"近五年"），
+        规则无法解析时再调用日期解析智能体。
 
         Args:
             text: 包含日期信息的文本
@@ -56,6 +63,11 @@ class DateParser:
         if current_time is None:
             current_time = datetime.now()
 
+        # 规则快速路径，命中时无需调用大语言模型
+        parsed = parse_relative_date(text, current_time)
+        if parsed:
+            return parsed
+
         # 构建提示词
         prompt = f"""请从以下文本中提取日期信息并格式化：
 
@@ -66,16 +78,30 @@ class DateParser:
 请只返回英文逗号`,`分隔的日期字符串，不要包含任何其他解释或文本。
 """
 
-        # 调用日期解析智能体
-        response = self.date_agent.generate_reply(
-            messages=[{"role": "user", "content": prompt}]
-        )
-
-        # 清理响应，确保只返回日期字符串
-        response = response.strip()
+        # 执行器返回去除首尾空白的日期字符串
+        response = await self.date_executor.complete(prompt)
 
         # 如果响应为空，返回当前年份
         if not response:
             return current_time.strftime("%Y")
 
         return response
+
+    def parse_date(
+        self, text: str, current_time: Optional[datetime] = None
+    ) -> str:
+        """同步解析文本中的日期表达（兼容旧版接口）
+
+        Args:
+            text: 包含日期信息的文本
+            current_time: 当前时间，默认为系统当前时间
+
+        Returns:
+            格式化的日期字符串，以英文逗号分隔
+        """
+        # 规则快速路径无需事件循环
+        parsed = parse_relative_date(text, current_time)
+        if parsed:
+            return parsed
+        # 使用事件循环运行异步方法
+        return run_sync(self.parse_date_async(text, current_time))
@@ -0,0 +1,235 @@
+"""
+向量计算执行器模块
+在线程池或进程池中计算文本向量，并将短时间内到达的并发请求合并为一次批量前向计算
+"""
+import asyncio
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Executor, Future, InvalidStateError, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from autogenchat_bi.utils.resources import (
+    DEFAULT_EMBEDDING_BACKEND,
+    DEFAULT_EMBEDDING_MODEL,
+    get_embedding_function,
+)
+
+# 进程池工作进程内的向量函数，由初始化函数加载
+_worker_embedding_function: Any = None
+
+
+def _init_worker(model_name: str, backend: str) -> None:
+    """进程池工作进程初始化：在子进程中加载向量模型"""
+    global _worker_embedding_function
+    _worker_embedding_function = get_embedding_function(model_name, backend)
+
+
+def _embed_in_worker(texts: List[str]) -> List[Any]:
+    """在进程池工作进程中计算向量"""
+    return list(_worker_embedding_function(texts))
+
+
+class EmbeddingExecutor:
+    """向量计算执行器
+
+    调用方提交的文本进入队列，由调度线程在 max_wait_ms 内收集请求（工作者全忙时继续累积），
+    合并为不超过 max_batch_size 条文本的批次，交给线程池或进程池完成一次前向计算后按请求拆分结果。
+    返回 concurrent.futures.Future，异步调用方通过 embed_async 等待，不会阻塞事件循环；
+    调度线程与事件循环无关，可在多个事件循环和同步代码之间共享。
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_EMBEDDING_MODEL,
+        backend: str = DEFAULT_EMBEDDING_BACKEND,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        max_workers: int = 1,
+        use_process_pool: bool = False,
+    ):
+        """初始化向量计算执行器
+
+        Args:
+            model_name: SentenceTransformer 模型名称
+            backend: 向量模型推理后端
+            max_batch_size: 每批最多合并的文本数量
+            max_wait_ms: 收到第一个请求后等待更多请求合并的最长时间（毫秒）
+            max_workers: 线程池或进程池的工作者数量
+            use_process_pool: 是否使用进程池，每个工作进程单独加载一份模型，避免与事件循环争用 GIL
+        """
+        self.model_name = model_name
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.use_process_pool = use_process_pool
+        self._queue: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        self._slots = threading.Semaphore(max_workers)
+        self.batches = 0
+        self.requests = 0
+
+        self._pool: Executor
+        if use_process_pool:
+            self._pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(model_name, backend),
+            )
+        else:
+            self.embedding_function = get_embedding_function(model_name, backend)
+            self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="embedding")
+
+        self._dispatcher = threading.Thread(target=self._dispatch, name="embedding-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        """提交一组文本，返回计算结果的 Future
+
+        Args:
+            texts: 待向量化的文本列表
+
+        Returns:
+            结果为与输入顺序一致的向量列表的 Future
+        """
+        future: Future = Future()
+        if not texts:
+            future.set_result([])
+        else:
+            self._queue.put((list(texts), future))
+        return future
+
+    async def embed_async(self, texts: List[str]) -> List[Any]:
+        """异步计算文本向量
+
+        Args:
+            texts: 待向量化的文本列表
+
+        Returns:
+            与输入顺序一致的向量列表
+        """
+        return await asyncio.wrap_future(self.submit(texts))
+
+    def embed(self, texts: List[str]) -> List[Any]:
+        """同步计算文本向量（供后台线程等非异步代码使用）"""
+        return self.submit(texts).result()
+
+    def _dispatch(self) -> None:
+        """调度线程：收集请求并按批次提交到工作池"""
+        while True:
+            batch: List[Tuple[List[str], Future]] = []
+            size = 0
+            while not batch:
+                size = self._join_batch(batch, self._queue.get(), size)
+            # 等待空闲的工作者，期间到达的请求合并到同一批次
+            self._slots.acquire()
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                size = self._join_batch(batch, item, size)
+            if not batch:
+                self._slots.release()
+                continue
+            try:
+                self._run_batch(batch)
+            except BaseException as e:
+                # 提交失败（如进程池已损坏）时把异常交给本批次的调用方，调度线程继续运行
+                print(f"[向量计算] 批次提交失败: {e}")
+                self._slots.release()
+                for _, future in batch:
+                    self._set_future(future, error=e)
+
+    @staticmethod
+    def _join_batch(batch: List[Tuple[List[str], Future]], item: Tuple[List[str], Future], size: int) -> int:
+        """将请求加入批次，已被调用方取消的请求直接丢弃
+
+        Returns:
+            加入后批次中的文本数量
+        """
+        if item[1].set_running_or_notify_cancel():
+            batch.append(item)
+            size += len(item[0])
+        return size
+
+    @staticmethod
+    def _set_future(future: Future, result: Any = None, error: Any = None) -> None:
+        """设置请求结果；Future 已完成时忽略"""
+        try:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            pass
+
+    def _run_batch(self, batch: List[Tuple[List[str], Future]]) -> None:
+        """提交一个合并后的批次，完成后按请求拆分结果"""
+        texts = [text for request_texts, _ in batch for text in request_texts]
+        if self.use_process_pool:
+            pool_future = self._pool.submit(_embed_in_worker, texts)
+        else:
+            pool_future = self._pool.submit(lambda: list(self.embedding_function(texts)))
+        self.batches += 1
+        self.requests += len(batch)
+
+        def split_results(done: Future) -> None:
+            self._slots.release()
+            error = done.exception()
+            offset = 0
+            for request_texts, future in batch:
+                if error is not None:
+                    self._set_future(future, error=error)
+                else:
+                    self._set_future(future, done.result()[offset : offset + len(request_texts)])
+                offset += len(request_texts)
+
+        pool_future.add_done_callback(split_results)
+
+    def stats(self) -> Dict[str, Any]:
+        """执行器统计信息
+
+        Returns:
+            包含合并前的请求数、实际执行的批次数和平均每批请求数的字典
+        """
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "requests_per_batch": self.requests / self.batches if self.batches else 0.0,
+            "pending": self._queue.qsize(),
+        }
+
+
+# 进程级向量计算执行器，按模型名称和推理后端共享
+_executors: Dict[Tuple[str, str], EmbeddingExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_embedding_executor(
+    model_name: str = DEFAULT_EMBEDDING_MODEL, backend: str = DEFAULT_EMBEDDING_BACKEND, **kwargs: Any
+) -> EmbeddingExecutor:
+    """获取进程内共享的向量计算执行器，同一模型和推理后端首次获取时按参数创建
+
+    Args:
+        model_name: SentenceTransformer 模型名称
+        backend: 向量模型推理后端
+        **kwargs: 传递给 EmbeddingExecutor 的其他参数
+
+    Returns:
+        共享的向量计算执行器
+    """
+    with _executors_lock:
+        executor = _executors.get((model_name, backend))
+        if executor is None:
+            executor = EmbeddingExecutor(model_name=model_name, backend=backend, **kwargs)
+            _executors[(model_name, backend)] = executor
+        return executor
+
+
+__all__ = ["EmbeddingExecutor", "get_embedding_executor"]
@@ -0,0 +1,51 @@
+"""
+后台事件循环模块
+为同步接口提供进程内常驻的事件循环，所有同步调用共用同一个事件循环
+"""
+import asyncio
+import threading
+from typing import Any, Coroutine, Optional, TypeVar
+
+T = TypeVar("T")
+
+_event_loop: Optional[asyncio.AbstractEventLoop] = None
+_event_loop_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """获取常驻的后台事件循环，首次调用时创建"""
+    global _event_loop
+    with _event_loop_lock:
+        if _event_loop is None:
+            _event_loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_event_loop.run_forever, name="autogen-bi-event-loop", daemon=True
+            ).start()
+        return _event_loop
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """在后台事件循环中运行协程并等待结果，供同步接口使用
+
+    共享的模型客户端（AsyncOpenAI/httpx 连接池）绑定在首次使用它的事件循环上，
+    每次同步调用都用 asyncio.run 新建并关闭事件循环会导致后续调用报 "Event loop is closed"，
+    因此所有同步接口都在同一个常驻事件循环中运行。
+
+    Args:
+        coro: 待运行的协程
+
+    Returns:
+        协程的返回值
+    """
+    loop = get_event_loop()
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+    if running_loop is loop:
+        coro.close()
+        raise RuntimeError("不能在后台事件循环中调用同步接口，请直接 await 对应的异步方法")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+__all__ = ["get_event_loop", "run_sync"]
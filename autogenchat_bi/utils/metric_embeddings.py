@@ -0,0 +1,151 @@
+"""
+标准指标向量矩阵模块
+将标准指标名称及别名的向量保存为内存映射的 float32 矩阵，用向量化点积完成 top-k 检索
+"""
+import hashlib
+import json
+import os
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class MetricEmbeddingMatrix:
+    """标准指标向量矩阵
+
+    每行对应一个标准指标名称或别名的归一化向量，行到标准指标名称的映射保存在同名 JSON 文件中。
+    词表和向量模型都未变化时直接以内存映射方式加载已有矩阵，无需重新向量化；
+    重建时先写入临时文件再原子替换，已映射旧文件的读者（其他线程或共享数据库目录的其他进程）不受影响；
+    标准指标词表规模很小，一次矩阵乘法即可完成一批查询的检索。
+    """
+
+    def __init__(self, names: List[str], matrix: np.ndarray):
+        """初始化向量矩阵
+
+        Args:
+            names: 每一行对应的标准指标名称
+            matrix: 行归一化的 float32 向量矩阵
+        """
+        self.names = names
+        self.matrix = matrix
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @staticmethod
+    def _normalize(vectors: Any) -> np.ndarray:
+        """按行归一化，使点积等于余弦相似度"""
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    @classmethod
+    def load_or_build(
+        cls,
+        metrics: Dict[str, List[str]],
+        embedding_function: Callable[[List[str]], Sequence[Sequence[float]]],
+        path: str,
+        model_name: str,
+    ) -> "MetricEmbeddingMatrix":
+        """加载已有的向量矩阵，词表或向量模型变化时重新构建
+
+        Args:
+            metrics: 标准指标名称到别名列表的映射
+            embedding_function: 向量函数
+            path: 矩阵文件路径（.npy），行映射保存在同名 .json 文件中
+            model_name: 向量模型名称，用于判断矩阵是否需要重建
+
+        Returns:
+            标准指标向量矩阵
+        """
+        texts, names = [], []
+        for name, aliases in metrics.items():
+            for text in (name, *aliases):
+                texts.append(text)
+                names.append(name)
+        signature = hashlib.md5(
+            json.dumps([model_name, texts, names], ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+
+        meta_path = os.path.splitext(path)[0] + ".json"
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("signature") == signature and os.path.exists(path):
+                matrix = np.load(path, mmap_mode="r")
+                # 其他进程可能正在替换两个文件，行数不一致时重新构建
+                if matrix.shape[0] == len(meta["names"]):
+                    return cls(meta["names"], matrix)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error loading metric embeddings, rebuilding: {e}")
+
+        if not texts:
+            return cls([], np.zeros((0, 0), dtype=np.float32))
+
+        vectors = cls._normalize(embedding_function(texts))
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # 写入临时文件后原子替换，不在原文件上截断重写
+        suffix = f".{uuid.uuid4().hex}.tmp"
+        with open(path + suffix, "wb") as f:
+            np.save(f, vectors)
+        with open(meta_path + suffix, "w", encoding="utf-8") as f:
+            json.dump({"signature": signature, "model": model_name, "names": names}, f, ensure_ascii=False)
+        os.replace(path + suffix, path)
+        os.replace(meta_path + suffix, meta_path)
+        print(f"[指标向量矩阵] 已向量化 {len(texts)} 个标准指标名称及别名")
+        return cls(names, np.load(path, mmap_mode="r"))
+
+    def search(self, query_vectors: Any, top_k: int = 5) -> List[List[Tuple[str, float]]]:
+        """批量检索最相似的标准指标
+
+        同一标准指标的多个名称、别名只保留得分最高的一个。
+
+        Args:
+            query_vectors: 查询向量，形状为 (查询数, 维度) 或 (维度,)
+            top_k: 每个查询返回的标准指标数量
+
+        Returns:
+            每个查询按相似度从高到低排列的 (标准指标名称, 余弦相似度) 列表
+        """
+        if not self.names:
+            return [[] for _ in np.atleast_2d(query_vectors)]
+        scores = self._normalize(query_vectors) @ self.matrix.T
+        # 别名会占用行，多取一些候选再按标准指标去重
+        k = min(len(self.names), top_k * 4)
+        results: List[List[Tuple[str, float]]] = []
+        for row in scores:
+            candidates = np.argpartition(-row, k - 1)[:k]
+            ranked: List[Tuple[str, float]] = []
+            for index in candidates[np.argsort(-row[candidates])]:
+                name = self.names[index]
+                if all(name != existing for existing, _ in ranked):
+                    ranked.append((name, float(row[index])))
+                    if len(ranked) == top_k:
+                        break
+            results.append(ranked)
+        return results
+
+    @staticmethod
+    def is_confident(ranked: List[Tuple[str, float]], margin: float, min_score: float) -> Optional[str]:
+        """判断检索结果是否足够确定
+
+        Args:
+            ranked: 按相似度排列的检索结果
+            margin: 第一名与第二名的最小相似度差
+            min_score: 第一名的最小相似度
+
+        Returns:
+            足够确定时返回第一名的标准指标名称，否则返回 None
+        """
+        if not ranked or ranked[0][1] < min_score:
+            return None
+        if len(ranked) > 1 and ranked[0][1] - ranked[1][1] < margin:
+            return None
+        return ranked[0][0]
+
+
+__all__ = ["MetricEmbeddingMatrix"]
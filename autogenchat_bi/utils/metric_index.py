@@ -0,0 +1,165 @@
+"""
+标准指标词法索引模块
+从标准指标文档中提取标准指标名称及别名，基于字符 n-gram 建立 BM25 倒排索引，
+并提供与向量检索结果的倒数排名融合
+"""
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 标准指标名称行，如 "标准指标：物业费收缴率"、"- **标准指标名称**: 物业费收缴率"
+METRIC_NAME_PATTERN = re.compile(r"^[\s>*#\-]*\**\s*标准指标(?:名称)?\s*\**\s*[:：]\s*\**\s*(.+?)\s*\**\s*$")
+# 别名行，归属于前面最近的标准指标，如 "别名：收缴率、物业费收费率"
+METRIC_ALIAS_PATTERN = re.compile(r"^[\s>*#\-]*\**\s*(?:别名|同义词|又称)\s*\**\s*[:：]\s*(.+?)\s*$")
+ALIAS_SEPARATORS = re.compile(r"[、,，;；/|]")
+
+
+def normalize_metric_text(text: str) -> str:
+    """规范化指标文本：去除空白和常见标点，转为小写"""
+    return re.sub(r"[\s\"'“”‘’`*]", "", text).lower()
+
+
+def extract_metric_names(content: str) -> Dict[str, List[str]]:
+    """从文档内容中提取标准指标名称及别名
+
+    Args:
+        content: 文档内容
+
+    Returns:
+        标准指标名称到别名列表的映射，按出现顺序排列
+    """
+    metrics: Dict[str, List[str]] = {}
+    current: Optional[str] = None
+    for line in content.splitlines():
+        name_match = METRIC_NAME_PATTERN.match(line)
+        if name_match:
+            current = name_match.group(1).strip()
+            metrics.setdefault(current, [])
+            continue
+        alias_match = METRIC_ALIAS_PATTERN.match(line)
+        if alias_match and current is not None:
+            for alias in ALIAS_SEPARATORS.split(alias_match.group(1)):
+                alias = alias.strip().strip("*")
+                if alias and alias != current and alias not in metrics[current]:
+                    metrics[current].append(alias)
+    return metrics
+
+
+def char_ngrams(text: str, sizes: Sequence[int] = (1, 2)) -> List[str]:
+    """按字符 n-gram 切分文本，无需中文分词词典"""
+    text = normalize_metric_text(text)
+    return [text[i : i + n] for n in sizes for i in range(len(text) - n + 1)]
+
+
+class MetricLexicalIndex:
+    """标准指标词法索引
+
+    每个标准指标的名称和别名组成一篇文档，按字符一元、二元 n-gram 建立倒排索引并以 BM25 打分。
+    查询与某个名称或别名完全一致，或只有一个标准指标覆盖了查询的绝大部分二元 n-gram 时，
+    认为匹配无歧义，可直接返回而无需调用大语言模型。
+    """
+
+    def __init__(self, metrics: Dict[str, List[str]], k1: float = 1.5, b: float = 0.75):
+        """构建词法索引
+
+        Args:
+            metrics: 标准指标名称到别名列表的映射
+            k1: BM25 词频饱和参数
+            b: BM25 文档长度归一化参数
+        """
+        self.k1 = k1
+        self.b = b
+        self.names: List[str] = list(metrics)
+        self._exact: Dict[str, str] = {}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._bigrams: List[set] = []
+        self._lengths: List[int] = []
+
+        for doc_id, name in enumerate(self.names):
+            terms = [name, *metrics[name]]
+            for term in terms:
+                self._exact.setdefault(normalize_metric_text(term), name)
+            tokens = [token for term in terms for token in char_ngrams(term)]
+            self._lengths.append(len(tokens))
+            self._bigrams.append({token for term in terms for token in char_ngrams(term, (2,))})
+            for token, tf in Counter(tokens).items():
+                self._postings.setdefault(token, {})[doc_id] = tf
+
+        self._avg_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        """按 BM25 检索标准指标
+
+        Args:
+            query: 查询文本
+            top_k: 返回结果数量
+
+        Returns:
+            按得分从高到低排列的 (标准指标名称, 得分) 列表
+        """
+        scores: Dict[int, float] = {}
+        total = len(self.names)
+        for token, qtf in Counter(char_ngrams(query)).items():
+            postings = self._postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / self._avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + qtf * idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(self.names[doc_id], score) for doc_id, score in ranked]
+
+    def match(self, query: str, threshold: float = 0.9) -> Optional[str]:
+        """查找无歧义的词法匹配
+
+        Args:
+            query: 查询文本
+            threshold: 标准指标需要覆盖的查询二元 n-gram 比例
+
+        Returns:
+            与名称或别名完全一致、或唯一覆盖查询的标准指标名称，否则返回 None
+        """
+        exact = self._exact.get(normalize_metric_text(query))
+        if exact is not None:
+            return exact
+
+        query_bigrams = set(char_ngrams(query, (2,)))
+        if not query_bigrams:
+            return None
+        covering = [
+            name
+            for name, bigrams in zip(self.names, self._bigrams)
+            if len(query_bigrams & bigrams) / len(query_bigrams) >= threshold
+        ]
+        return covering[0] if len(covering) == 1 else None
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """倒数排名融合
+
+    Args:
+        rankings: 多路检索结果，每路为按相关度排列的标准指标名称
+        k: 平滑常数
+
+    Returns:
+        按融合得分从高到低排列的 (标准指标名称, 得分) 列表
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, name in enumerate(ranking):
+            scores[name] = scores.get(name, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+__all__ = [
+    "MetricLexicalIndex",
+    "extract_metric_names",
+    "char_ngrams",
+    "normalize_metric_text",
+    "reciprocal_rank_fusion",
+]
@@ -3,21 +3,25 @@
 """
 
 from typing import Dict, List, Any, Optional
-import asyncio
+import os
 from datetime import datetime
 import json
 
-# 导入最新版 AutoGen 组件
-from autogen_agentchat.agents import AssistantAgent
-from autogen_agentchat.ui import Console
-from autogen_ext.models.openai import OpenAIChatCompletionClient
+from autogenchat_bi.utils.completion import CompletionExecutor, get_model_client
+from autogenchat_bi.utils.event_loop import run_sync
+from autogenchat_bi.utils.project_gazetteer import get_project_gazetteer
+
+# 默认项目目录文件路径
+DEFAULT_PROJECT_CATALOG_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "project-catalog.txt"
+)
 
 
 class ProjectExtractor:
     """项目名称提取器
 
     从文本中提取项目名称，不包含"项目"字样，遵循最小描述原则。
-    使用AutoGen智能体进行语义理解和提取，而非正则表达式。
+    优先使用项目目录词典匹配已知项目，未匹配到时再调用大语言模型进行语义理解和提取。
     """
 
     def __init__(self, llm_config: Dict[str, Any]):
@@ -29,19 +33,14 @@ class ProjectExtractor:
         self.llm_config = llm_config
         self.use_stream_mode = llm_config.get("use_stream_mode", True)
 
-        # 创建模型客户端
-        model_client = OpenAIChatCompletionClient(
-            model=llm_config.get("model", "gpt-4o"),
-            api_key=llm_config.get("api_key"),
-            base_url=llm_config.get("base_url"),
-            temperature=llm_config.get("temperature", 0.0),
-            model_info=llm_config.get("model_info"),
+        # 项目目录词典，进程内共享，目录文件修改后自动重新加载
+        self.gazetteer = get_project_gazetteer(
+            llm_config.get("project_catalog_path", DEFAULT_PROJECT_CATALOG_PATH)
         )
 
-        # 创建项目名称提取智能体
-        self.project_agent = AssistantAgent(
-            name="project_extractor_agent",  # 使用英文名称
-            description="项目名称提取智能体",
+        # 创建项目名称提取执行器（单轮无状态调用，无需智能体）
+        self.project_executor = CompletionExecutor(
+            name="项目提取",
             system_message="""你是一个专业的项目名称提取专家，负责从文本中识别和提取项目名称。
 
 你的任务是从用户输入的文本中提取出所有项目名称，并遵循以下规则：
@@ -61,8 +60,9 @@ class ProjectExtractor:
 - 输入："华中物业和西南物业的去年的旧欠实收是多少" -> 华中,西南
 - 输入："成都高新园区和天府新区的收入情况" -> 成都高新,天府新区
 """,
-            model_client=model_client,
-            model_client_stream=self.use_stream_mode,
+            model_client=get_model_client(llm_config),
+            use_stream_mode=self.use_stream_mode,
+            print_stream_output=llm_config.get("print_stream_output", False),
         )
 
     async def extract_projects_async(self, text: str) -> str:
@@ -74,6 +74,11 @@ class ProjectExtractor:
         Returns:
             str: 提取的项目名称，多个项目名称用英文逗号分隔
         """
+        # 优先使用项目目录词典匹配，命中时无需调用大语言模型
+        projects = self.gazetteer.extract(text)
+        if projects:
+            return ",".join(projects)
+
         # 构建提示词
         prompt = f"""请从以下文本中提取项目名称：
 
@@ -83,35 +88,8 @@ class ProjectExtractor:
 如果没有找到项目名称，请返回空字符串。
 """
 
-        # 检查配置是否启用流式模式
-        use_stream_mode = self.llm_config.get("use_stream_mode", True)  # 默认启用流式模式
-        print_stream_output = self.llm_config.get("print_stream_output", False)  # 默认不打印
-
-        if use_stream_mode:
-            # 使用流式模式
-            print("[项目提取] 使用流式模式...")
-
-            # 准备流式输出生成器
-            stream_generator = self.project_agent.run_stream(task=prompt)
-
-            # 使用 Console 类处理流式输出并获取结果
-            if print_stream_output:
-                print("[项目提取] 流式输出开始:")
-                result = await Console(stream_generator, output_stats=True)
-            else:
-                result = await Console(stream_generator, output_stats=False)
-        else:
-            # 使用非流式模式
-            print("[项目提取] 使用非流式模式...")
-            result = await self.project_agent.run(task=prompt)
-
-        # 从结果中获取最后一条消息的内容
-        response = result.messages[-1].content
-
-        # 清理响应，确保只返回项目名称字符串
-        response = response.strip()
-
-        return response
+        # 执行器返回去除首尾空白的项目名称字符串
+        return await self.project_executor.complete(prompt)
 
     def extract_projects(self, text: str) -> str:
         """同步从文本中提取项目名称（兼容旧版接口）
@@ -122,5 +100,9 @@ class ProjectExtractor:
         Returns:
             str: 提取的项目名称，多个项目名称用英文逗号分隔
         """
+        # 词典匹配无需事件循环
+        projects = self.gazetteer.extract(text)
+        if projects:
+            return ",".join(projects)
         # 使用事件循环运行异步方法
-        return asyncio.run(self.extract_projects_async(text))
+        return run_sync(self.extract_projects_async(text))
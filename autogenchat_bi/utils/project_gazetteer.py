@@ -0,0 +1,180 @@
+"""
+项目名称词典模块
+基于 Aho-Corasick 自动机，从已知的项目目录中线性时间匹配项目名称
+"""
+import os
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+# 项目名称中需要去除的后缀，遵循最小描述原则
+PROJECT_SUFFIXES = ("项目", "物业")
+
+
+def normalize_project_name(name: str) -> str:
+    """去除项目名称的 "项目"、"物业" 后缀，得到最小化的项目名称"""
+    name = name.strip()
+    stripped = True
+    while stripped:
+        stripped = False
+        for suffix in PROJECT_SUFFIXES:
+            if name.endswith(suffix) and len(name) > len(suffix):
+                name = name[: -len(suffix)]
+                stripped = True
+    return name
+
+
+class _Automaton:
+    """Aho-Corasick 自动机"""
+
+    def __init__(self, keywords: Dict[str, str]):
+        """构建自动机
+
+        Args:
+            keywords: 关键词到标准项目名称的映射
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # 每个状态上结束的关键词：(关键词长度, 标准项目名称)
+        self._output: List[List[Tuple[int, str]]] = [[]]
+
+        for keyword, canonical in keywords.items():
+            state = 0
+            for char in keyword:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._output[state].append((len(keyword), canonical))
+
+        # 按层次遍历计算失败指针，并合并失败状态上的输出
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find_all(self, text: str) -> List[Tuple[int, int, str]]:
+        """查找所有匹配，返回 (起始位置, 长度, 标准项目名称) 列表"""
+        matches = []
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for length, canonical in self._output[state]:
+                matches.append((index - length + 1, length, canonical))
+        return matches
+
+
+class ProjectGazetteer:
+    """项目名称词典
+
+    从目录文件加载项目名称及别名，编译为 Aho-Corasick 自动机。
+    目录文件每行一个项目，格式为 "项目名称,别名1,别名2"，# 开头的行为注释。
+    每个名称会同时登记原始形式、去除后缀的形式以及补全 "项目"/"物业" 后缀的形式，
+    匹配结果统一为第一个名称去除后缀后的最小化项目名称。
+    目录文件在磁盘上修改后，下次匹配时自动重新加载。
+    """
+
+    def __init__(self, catalog_path: Optional[str]):
+        """初始化项目名称词典
+
+        Args:
+            catalog_path: 项目目录文件路径，文件不存在时词典为空
+        """
+        self.catalog_path = catalog_path
+        self._automaton: Optional[_Automaton] = None
+        self._mtime: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _parse_catalog(content: str) -> Dict[str, str]:
+        """解析目录文件内容，返回关键词到标准项目名称的映射"""
+        keywords = {}
+        for line in content.splitlines():
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            names = [name.strip() for name in line.replace("，", ",").split(",") if name.strip()]
+            if not names:
+                continue
+            canonical = normalize_project_name(names[0])
+            for name in names:
+                base = normalize_project_name(name)
+                for keyword in (name, base, *(base + suffix for suffix in PROJECT_SUFFIXES)):
+                    keywords.setdefault(keyword, canonical)
+        return keywords
+
+    def _maybe_reload(self) -> Optional[_Automaton]:
+        """目录文件变化时重新编译自动机"""
+        if not self.catalog_path:
+            return None
+        try:
+            mtime = os.stat(self.catalog_path).st_mtime_ns
+        except FileNotFoundError:
+            self._automaton = None
+            self._mtime = None
+            return None
+        if mtime == self._mtime:
+            return self._automaton
+
+        with self._lock:
+            if mtime != self._mtime:
+                with open(self.catalog_path, "r", encoding="utf-8") as file:
+                    keywords = self._parse_catalog(file.read())
+                self._automaton = _Automaton(keywords) if keywords else None
+                self._mtime = mtime
+                print(f"[项目词典] 已加载 {len(keywords)} 个项目关键词")
+        return self._automaton
+
+    def extract(self, text: str) -> List[str]:
+        """从文本中提取项目名称
+
+        重叠的匹配中优先保留起始位置最靠前、长度最长的一个。
+
+        Args:
+            text: 输入文本
+
+        Returns:
+            按出现顺序排列、去重后的最小化项目名称列表
+        """
+        automaton = self._maybe_reload()
+        if automaton is None or not text:
+            return []
+
+        projects: List[str] = []
+        covered_until = 0
+        for start, length, canonical in sorted(automaton.find_all(text), key=lambda m: (m[0], -m[1])):
+            if start < covered_until:
+                continue
+            covered_until = start + length
+            if canonical not in projects:
+                projects.append(canonical)
+        return projects
+
+
+# 进程级项目名称词典，按目录文件路径共享
+_gazetteers: Dict[str, ProjectGazetteer] = {}
+_gazetteers_lock = threading.Lock()
+
+
+def get_project_gazetteer(catalog_path: str) -> ProjectGazetteer:
+    """获取进程内共享的项目名称词典，同一目录文件只编译一次"""
+    key = os.path.abspath(catalog_path)
+    with _gazetteers_lock:
+        gazetteer = _gazetteers.get(key)
+        if gazetteer is None:
+            gazetteer = ProjectGazetteer(key)
+            _gazetteers[key] = gazetteer
+        return gazetteer
+
+
+__all__ = ["ProjectGazetteer", "get_project_gazetteer", "normalize_project_name", "PROJECT_SUFFIXES"]
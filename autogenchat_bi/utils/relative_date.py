@@ -0,0 +1,226 @@
+"""
+相对日期规则解析模块
+基于规则解析常见的中文日期表达，无需调用大语言模型
+"""
+import re
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+# 中文数字
+_CN_DIGITS = {"零": 0, "〇": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4,
+              "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+
+# 年份表达：2024年、今年、去年等
+_YEAR = r"(?:\d{4}年|今年|本年|去年|上一?年|前年|明年)"
+# 数量表达：阿拉伯数字或十以内的中文数字
+_NUM = r"(?:\d{1,2}|[一二两三四五六七八九十]{1,3})"
+# 区间连接词
+_RANGE = r"\s*(?:到|至|-|~|～|—)\s*"
+# 日期之间允许出现的连接词和修饰词，解析后剩余的文本只能由这些字符组成
+_FILLER = re.compile(r"[\s,，、;；和与及跟以的份度间期内整全共数据]")
+
+
+def _cn_to_int(text: str) -> int:
+    """将阿拉伯数字或中文数字（最大九十九）转换为整数"""
+    if text.isdigit():
+        return int(text)
+    if "十" in text:
+        tens, _, units = text.partition("十")
+        return (_CN_DIGITS[tens] if tens else 1) * 10 + (_CN_DIGITS[units] if units else 0)
+    return _CN_DIGITS[text]
+
+
+def _resolve_year(token: Optional[str], now: datetime, carry: Dict[str, int]) -> int:
+    """解析年份表达
+
+    未指定年份时沿用文本中前面最近一次明确指定的年份（如 "2024年3月和4月" 中的 4 月），
+    前面也没有时返回当前年份；明确指定的年份记录到 carry 中供后面的表达沿用。
+    """
+    if not token:
+        return carry.get("year", now.year)
+    if token[:4].isdigit():
+        year = int(token[:4])
+    else:
+        offsets = {"今年": 0, "本年": 0, "去年": -1, "上年": -1, "上一年": -1, "前年": -2, "明年": 1}
+        year = now.year + offsets[token]
+    carry["year"] = year
+    return year
+
+
+def _shift_month(year: int, month: int, delta: int) -> Tuple[int, int]:
+    """按月偏移"""
+    index = year * 12 + month - 1 + delta
+    return index // 12, index % 12 + 1
+
+
+def _month_range(year: int, month: int, end_year: int, end_month: int) -> List[str]:
+    """生成闭区间内的 yyyy-MM 列表"""
+    if not (1 <= month <= 12 and 1 <= end_month <= 12):
+        raise ValueError(f"无效的月份: {month}, {end_month}")
+    result = []
+    while (year, month) <= (end_year, end_month):
+        result.append(f"{year:04d}-{month:02d}")
+        year, month = _shift_month(year, month, 1)
+    return result
+
+
+def _quarter_months(year: int, quarter: int) -> List[str]:
+    """某季度的 yyyy-MM 列表"""
+    first = (quarter - 1) * 3 + 1
+    return _month_range(year, first, year, first + 2)
+
+
+def _year_month_range(m: re.Match, now: datetime, carry: Dict[str, int]) -> List[str]:
+    year = _resolve_year(m.group(1), now, carry)
+    end_year = _resolve_year(m.group(3), now, carry) if m.group(3) else year
+    return _month_range(year, _cn_to_int(m.group(2)), end_year, _cn_to_int(m.group(4)))
+
+
+def _year_range(m: re.Match, now: datetime, carry: Dict[str, int]) -> List[str]:
+    return [str(y) for y in range(int(m.group(1)), int(m.group(2)) + 1)]
+
+
+def _year_month(m: re.Match, now: datetime, carry: Dict[str, int]) -> List[str]:
+    return _month_range(_resolve_year(m.group(1), now, carry), _cn_to_int(m.group(2)),
+                        _resolve_year(m.group(1), now, carry), _cn_to_int(m.group(2)))
+
+
+def _half_year(m: re.Match, now: datetime, carry: Dict[str, int]) -> List[str]:
+    year = _resolve_year(m.group(1), now, carry)
+    return _month_range(year, 1, year, 6) if m.group(2) == "上" else _month_range(year, 7, year, 12)
+
+
+def _quarter(m: re.Match, now: datetime, carry: Dict[str, int]) -> List[str]:
+    return _quarter_months(_resolve_year(m.group(1), now, carry), _cn_to_int(m.group(2) or m.group(3)))
+
+
+def _relative_quarter(m: re.Match, now: datetime, carry: Dict[str, int]) -> List[str]:
+    delta = {"上": -3, "下": 3}.get(m.group(1)[0], 0)
+    year, month = _shift_month(now.year, now.month, delta)
+    return _quarter_months(year, (month - 1) // 3 + 1)
+
+
+def _relative_month(m: re.Match, now: datetime, carry: Dict[str, int]) -> List[str]:
+    delta = {"上": -1, "下": 1}.get(m.group(1)[0], 0)
+    year, month = _shift_month(now.year, now.month, delta)
+    return _month_range(year, month, year, month)
+
+
+def _recent(m: re.Match, now: datetime, carry: Dict[str, int]) -> List[str]:
+    count = _cn_to_int(m.group(1))
+    if count <= 0:
+        return []
+    if m.group(2) == "年":
+        return [str(y) for y in range(now.year - count + 1, now.year + 1)]
+    year, month = _shift_month(now.year, now.month, 1 - count)
+    return _month_range(year, month, now.year, now.month)
+
+
+def _year_to_date(m: re.Match, now: datetime, carry: Dict[str, int]) -> List[str]:
+    return _month_range(now.year, 1, now.year, now.month)
+
+
+def _year(m: re.Match, now: datetime, carry: Dict[str, int]) -> List[str]:
+    return [str(_resolve_year(m.group(1), now, carry))]
+
+
+def _month(m: re.Match, now: datetime, carry: Dict[str, int]) -> List[str]:
+    year = _resolve_year(None, now, carry)
+    return _month_range(year, _cn_to_int(m.group(1)), year, _cn_to_int(m.group(1)))
+
+
+# 按优先级排列的规则，较具体的表达（区间、年+月）先于单独的年或月匹配
+_RULES: List[Tuple[re.Pattern, Callable[[re.Match, datetime, Dict[str, int]], List[str]]]] = [
+    (re.compile(rf"(\d{{4}})年?{_RANGE}(\d{{4}})年?"), _year_range),
+    (re.compile(r"(?<!\d)(\d{4})[-/.](\d{1,2})(?!\d)"), _year_month),
+    (re.compile(rf"({_YEAR})?的?(?<!\d)({_NUM})(?:月份?)?{_RANGE}({_YEAR})?({_NUM})月份?"), _year_month_range),
+    (re.compile(rf"({_YEAR})的?({_NUM})月份?(?:{_NUM}[日号])?"), _year_month),
+    (re.compile(rf"({_YEAR})?的?(上|下)半年"), _half_year),
+    (re.compile(rf"({_YEAR})?的?(?:第?([一二三四1-4])季度|[Qq]([1-4]))"), _quarter),
+    (re.compile(r"(本|这个?|当前|上个?|下个?)季度"), _relative_quarter),
+    (re.compile(rf"(本|这个?|当|上个?|下个?)月份?(?:{_NUM}[日号])?"), _relative_month),
+    (re.compile(rf"(?:近|最近|过去)({_NUM})个?(年|月)"), _recent),
+    (re.compile(r"(?:今年|本年)以来|年初(?:至|到)(?:今|现在)"), _year_to_date),
+    (re.compile(rf"({_YEAR})?的?全年"), _year),
+    (re.compile(rf"({_YEAR})"), _year),
+    (re.compile(r"(?<!\d)((?:19|20)\d{2})(?!\d)"), _year),
+    (re.compile(rf"(?<!\d)({_NUM})月份?(?:{_NUM}[日号])?"), _month),
+]
+
+
+def _apply_rules(text: str, now: datetime) -> Tuple[Set[str], str]:
+    """依次应用各规则，返回解析出的日期集合和去除已匹配表达后的剩余文本
+
+    各规则按优先级匹配，匹配到的表达再按在文本中的位置依次解析，
+    使省略年份的表达沿用前面明确指定的年份。日期无效（如 13 月）时抛出 ValueError
+    """
+    remaining = text
+    matches: List[Tuple[int, Callable[[re.Match, datetime, Dict[str, int]], List[str]], re.Match]] = []
+    for pattern, handler in _RULES:
+        def replace(m: re.Match) -> str:
+            matches.append((m.start(), handler, m))
+            return " " * len(m.group(0))
+
+        remaining = pattern.sub(replace, remaining)
+
+    dates: Set[str] = set()
+    carry: Dict[str, int] = {}
+    for _, handler, m in sorted(matches, key=lambda item: item[0]):
+        try:
+            dates.update(handler(m, now, carry))
+        except KeyError as e:
+            raise ValueError(f"无法解析的日期表达: {text}") from e
+    return dates, remaining
+
+
+def parse_relative_date(text: str, now: Optional[datetime] = None) -> Optional[str]:
+    """基于规则解析日期表达
+
+    依次用各规则匹配文本中的日期表达并替换为空白，全部规则匹配后
+    剩余文本只包含连接词时视为解析成功；含有无法识别的内容时返回 None，
+    由调用方回退到大语言模型解析。
+
+    Args:
+        text: 日期表达，如 "2024年"、"上半年"、"上个季度"、"近五年"
+        now: 当前时间，默认为系统当前时间
+
+    Returns:
+        升序排列、英文逗号分隔的 yyyy 或 yyyy-MM 日期字符串，无法解析时返回 None
+    """
+    if not text or not text.strip():
+        return None
+    if now is None:
+        now = datetime.now()
+
+    try:
+        dates, remaining = _apply_rules(text.strip(), now)
+    except ValueError:
+        return None
+
+    if not dates or _FILLER.sub("", remaining):
+        return None
+    return ",".join(sorted(dates))
+
+
+def extract_date_context(text: str, now: Optional[datetime] = None) -> Optional[str]:
+    """提取整句文本中所有可识别日期表达解析后的日期
+
+    与 parse_relative_date 不同，文本中可以包含日期以外的内容。
+
+    Args:
+        text: 任意文本，如完整的用户查询
+        now: 当前时间，默认为系统当前时间
+
+    Returns:
+        升序排列、英文逗号分隔的日期字符串，没有日期表达时为空字符串，日期无效时返回 None
+    """
+    if now is None:
+        now = datetime.now()
+    try:
+        dates, _ = _apply_rules(text or "", now)
+    except ValueError:
+        return None
+    return ",".join(sorted(dates))
+
+
+__all__ = ["parse_relative_date", "extract_date_context"]
@@ -0,0 +1,114 @@
+"""
+共享资源模块
+进程级注册表，延迟创建并复用向量模型、ChromaDB 客户端等重量级资源
+"""
+import os
+import platform
+import threading
+from typing import Any, Dict, Tuple
+
+import chromadb
+from chromadb.utils import embedding_functions
+
+# 默认向量模型
+# shibing624/text2vec-base-chinese：专门针对中文优化的语义向量模型，支持中文文本相似度计算
+# moka-ai/m3e-base：国内团队开发的多语言语义向量模型，对中文有很好的支持
+# BAAI/bge-small-zh：北京智源研究院开发的中文语义向量模型，性能优秀
+DEFAULT_EMBEDDING_MODEL = "BAAI/bge-small-zh"
+
+# 向量模型推理后端
+# torch：PyTorch 推理（默认）
+# onnx：ONNX Runtime 推理，向量与 torch 后端一致，CPU 上启动和推理更快
+# onnx-int8：动态 int8 量化的 ONNX 模型，向量与 torch 后端近似但不完全一致，切换后需要重建索引
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+DEFAULT_EMBEDDING_BACKEND = "torch"
+
+# 量化模型的本地缓存目录
+MODEL_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "autogenchat_bi", "models")
+
+_lock = threading.Lock()
+_embedding_functions: Dict[Tuple[str, str], Any] = {}
+_chroma_clients: Dict[str, Any] = {}
+
+
+def _export_int8_model(model_name: str) -> Tuple[str, str]:
+    """导出动态 int8 量化的 ONNX 模型到本地缓存目录，已导出时直接复用
+
+    Returns:
+        (模型目录, 量化模型文件相对路径)
+    """
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    config = "arm64" if platform.machine().lower() in ("arm64", "aarch64") else "avx2"
+    file_name = f"onnx/model_qint8_{config}.onnx"
+    model_dir = os.path.join(MODEL_CACHE_DIR, model_name.replace("/", "--"))
+    if not os.path.exists(os.path.join(model_dir, file_name)):
+        print(f"[共享资源] 导出 int8 量化模型: {model_name} -> {model_dir}")
+        model = SentenceTransformer(model_name, backend="onnx")
+        model.save(model_dir)
+        export_dynamic_quantized_onnx_model(model, config, model_dir)
+    return model_dir, file_name
+
+
+def get_embedding_function(
+    model_name: str = DEFAULT_EMBEDDING_MODEL, backend: str = DEFAULT_EMBEDDING_BACKEND
+) -> Any:
+    """获取进程内共享的向量函数，首次调用时加载模型
+
+    Args:
+        model_name: SentenceTransformer 模型名称
+        backend: 推理后端，取值见 EMBEDDING_BACKENDS
+
+    Returns:
+        ChromaDB 向量函数
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"不支持的向量模型推理后端: {backend}，可选值: {', '.join(EMBEDDING_BACKENDS)}")
+    with _lock:
+        embedding_function = _embedding_functions.get((model_name, backend))
+        if embedding_function is None:
+            print(f"[共享资源] 加载向量模型: {model_name}（{backend}）")
+            if backend == "torch":
+                embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
+                    model_name=model_name
+                )
+            elif backend == "onnx":
+                embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
+                    model_name=model_name, backend="onnx"
+                )
+            else:
+                model_dir, file_name = _export_int8_model(model_name)
+                embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
+                    model_name=model_dir, backend="onnx", model_kwargs={"file_name": file_name}
+                )
+            _embedding_functions[(model_name, backend)] = embedding_function
+        return embedding_function
+
+
+def get_chroma_client(db_path: str) -> Any:
+    """获取进程内共享的 ChromaDB 持久化客户端
+
+    Args:
+        db_path: ChromaDB 数据库路径
+
+    Returns:
+        ChromaDB 客户端
+    """
+    key = os.path.abspath(db_path)
+    with _lock:
+        client = _chroma_clients.get(key)
+        if client is None:
+            # 创建数据库目录（如果不存在）
+            os.makedirs(key, exist_ok=True)
+            client = chromadb.PersistentClient(path=key)
+            _chroma_clients[key] = client
+        return client
+
+
+__all__ = [
+    "DEFAULT_EMBEDDING_MODEL",
+    "DEFAULT_EMBEDDING_BACKEND",
+    "EMBEDDING_BACKENDS",
+    "get_embedding_function",
+    "get_chroma_client",
+]
@@ -5,25 +5,40 @@
 
 import os
 import re
-import time
 import hashlib
 import asyncio
 import json
+import threading
 from datetime import datetime
 from functools import lru_cache
 from typing import Dict, List, Any, Optional, Set, Tuple
-import chromadb
-from chromadb.utils import embedding_functions
-from autogen_agentchat.agents import AssistantAgent
-from autogen_agentchat.ui import Console
-from autogen_ext.models.openai import OpenAIChatCompletionClient
+
+from autogenchat_bi.utils.completion import CompletionExecutor, get_model_client
+from autogenchat_bi.utils.embedding_executor import get_embedding_executor
+from autogenchat_bi.utils.event_loop import run_sync
+from autogenchat_bi.utils.metric_embeddings import MetricEmbeddingMatrix
+from autogenchat_bi.utils.metric_index import (
+    MetricLexicalIndex,
+    extract_metric_names,
+    reciprocal_rank_fusion,
+)
+from autogenchat_bi.utils.resources import (
+    DEFAULT_EMBEDDING_BACKEND,
+    DEFAULT_EMBEDDING_MODEL,
+    get_chroma_client,
+    get_embedding_function,
+)
+from autogenchat_bi.utils.ttl_cache import get_shared_cache
 
 
 class TargetExtractor:
     """标准指标名称解析器
 
     使用ChromaDB向量库对文档进行向量化，然后基于检索结果校准指标名称
-    支持缓存机制和增量更新文档
+    支持缓存机制和增量更新文档；索引默认在后台线程中构建，构建期间使用已有的索引提供查询
+    启用混合检索时，标准指标名称及别名的词法索引与向量检索结果按倒数排名融合，
+    词法匹配无歧义时直接返回，不再调用大语言模型；
+    标准指标名称向量矩阵检索结果足够确定（第一名明显领先第二名）时同样直接返回
     """
 
     def __init__(
@@ -33,6 +48,19 @@ class TargetExtractor:
         db_path: str = "./chroma_db",
         cache_size: int = 100,
         cache_ttl: int = 3600,
+        cache_persist: bool = True,
+        background_index: bool = True,
+        index_batch_size: int = 64,
+        index_wait_timeout: float = 60.0,
+        hybrid_search: bool = True,
+        lexical_threshold: float = 0.9,
+        embedding_matrix: bool = True,
+        embedding_margin: float = 0.05,
+        embedding_min_score: float = 0.75,
+        embedding_workers: int = 1,
+        embedding_process_pool: bool = False,
+        embedding_batch_wait_ms: float = 5.0,
+        embedding_backend: str = DEFAULT_EMBEDDING_BACKEND,
     ):
         """初始化标准指标名称解析器
 
@@ -42,6 +70,20 @@ class TargetExtractor:
             db_path: ChromaDB数据库路径
             cache_size: 缓存大小，默认100条
             cache_ttl: 缓存过期时间，默认3600秒（1小时）
+            cache_persist: 是否将缓存持久化到数据库目录下的 SQLite 文件，默认True
+            background_index: 是否在后台线程中构建索引，默认True；为False时在构造函数中同步构建
+            index_batch_size: 每批向量化写入集合的文档块数量，默认64
+            index_wait_timeout: 尚无可用索引时查询等待索引构建完成的最长时间（秒），默认60秒
+            hybrid_search: 是否启用词法与向量混合检索，默认True
+            lexical_threshold: 词法匹配无歧义所需的查询覆盖比例，默认0.9
+            embedding_matrix: 是否使用标准指标名称向量矩阵检索，默认True
+            embedding_margin: 向量矩阵检索第一名领先第二名的最小相似度差，低于该值时交给大语言模型选择，默认0.05
+            embedding_min_score: 向量矩阵检索第一名的最小相似度，默认0.75
+            embedding_workers: 查询向量计算的工作线程（或进程）数量，默认1
+            embedding_process_pool: 是否在进程池中计算查询向量，默认False
+            embedding_batch_wait_ms: 合并并发查询向量计算请求的等待时间（毫秒），默认5毫秒
+            embedding_backend: 向量模型推理后端（torch/onnx/onnx-int8），默认torch；
+                切换到向量不兼容的后端时自动重建索引
         """
         self.llm_config = llm_config
         self.use_stream_mode = llm_config.get("use_stream_mode", True)
@@ -50,30 +92,22 @@ class TargetExtractor:
         self.cache_size = cache_size
         self.cache_ttl = cache_ttl
 
-        # 初始化缓存
-        self.query_cache = {}
-        self.cache_timestamps = {}
+        # 初始化缓存：同一数据库路径的解析器在进程内共享缓存，可持久化以便重启后复用
+        self.query_cache = get_shared_cache(
+            f"target_extractor:{os.path.abspath(db_path)}",
+            max_size=cache_size,
+            ttl=cache_ttl,
+            persist_path=os.path.join(db_path, "target_cache.sqlite3") if cache_persist else None,
+        )
 
         # 文档元数据缓存
         self.doc_metadata = {}
         self.metadata_file = os.path.join(db_path, "doc_metadata.json")
         self._load_metadata()
 
-        # 创建模型客户端
-        # 百炼 API 需要流式模式，但我们不能直接设置 stream=True
-        # 我们需要在 create 方法调用时设置流式模式
-        model_client = OpenAIChatCompletionClient(
-            model=llm_config.get("model", "gpt-4o"),
-            api_key=llm_config.get("api_key"),
-            base_url=llm_config.get("base_url"),
-            temperature=llm_config.get("temperature", 0.0),
-            model_info=llm_config.get("model_info"),
-        )
-
-        # 创建标准指标名称解析智能体
-        self.target_agent = AssistantAgent(
-            name="target_extractor_agent",
-            description="标准指标名称关键词识别器",
+        # 创建标准指标名称解析执行器（单轮无状态调用，可在共享的解析器上并发使用）
+        self.target_executor = CompletionExecutor(
+            name="指标提取",
             system_message="""你是一个标准指标名称关键词识别器，可以对用户的输入进行校准，返回"标准指标"对应的名称。
 
 根据检索到的语料知识库的上下文和用户的输入、找到最匹配的**标准名称**并且回复，你必须选择其中一个！
@@ -82,8 +116,9 @@ class TargetExtractor:
 1. 只能返回检索到的"标准指标"名称后紧跟的指标名称
 2. 禁止回复其他内容，不要给用户选择
 """,
-            model_client=model_client,
-            model_client_stream=self.use_stream_mode,
+            model_client=get_model_client(llm_config),
+            use_stream_mode=self.use_stream_mode,
+            print_stream_output=llm_config.get("print_stream_output", False),
         )
 
         # 初始化ChromaDB客户端
@@ -91,34 +126,184 @@ class TargetExtractor:
         #     api_key=llm_config.get("api_key"), model_name="text-embedding-ada-002"
         # )
 
-        # shibing624/text2vec-base-chinese：专门针对中文优化的语义向量模型，支持中文文本相似度计算
-        # moka-ai/m3e-base：国内团队开发的多语言语义向量模型，对中文有很好的支持
-        # BAAI/bge-small-zh：北京智源研究院开发的中文语义向量模型，性能优秀
-        self.embedding_function = (
-            embedding_functions.SentenceTransformerEmbeddingFunction(
-                model_name="BAAI/bge-small-zh"
-            )
+        # 向量模型和ChromaDB客户端在进程内共享，避免重复加载模型
+        self.embedding_backend = embedding_backend
+        self.embedding_function = get_embedding_function(DEFAULT_EMBEDDING_MODEL, embedding_backend)
+        self.client = get_chroma_client(db_path)
+
+        # 查询向量在进程内共享的执行器中计算，不阻塞事件循环，并发请求合并为一次批量计算
+        self.embedding_executor = get_embedding_executor(
+            DEFAULT_EMBEDDING_MODEL,
+            embedding_backend,
+            max_workers=embedding_workers,
+            use_process_pool=embedding_process_pool,
+            max_wait_ms=embedding_batch_wait_ms,
         )
 
-        # 创建数据库目录（如果不存在）
-        os.makedirs(db_path, exist_ok=True)
-
-        self.client = chromadb.PersistentClient(path=db_path)
+        # 标准指标词法索引，在索引构建时从文档中提取
+        self.hybrid_search = hybrid_search
+        self.lexical_threshold = lexical_threshold
+        self.metric_index: Optional[MetricLexicalIndex] = None
+
+        # 标准指标名称向量矩阵，以内存映射方式保存在数据库目录下
+        self.use_embedding_matrix = embedding_matrix
+        self.embedding_margin = embedding_margin
+        self.embedding_min_score = embedding_min_score
+        self.metric_matrix: Optional[MetricEmbeddingMatrix] = None
+
+        # 索引构建状态
+        self.index_batch_size = index_batch_size
+        self.index_wait_timeout = index_wait_timeout
+        self._index_lock = threading.Lock()
+        self._index_thread: Optional[threading.Thread] = None
+        self._index_ready = threading.Event()
+        self._index_status: Dict[str, Any] = {
+            "state": "pending",
+            "serving": False,
+            "total_chunks": 0,
+            "indexed_chunks": 0,
+            "error": None,
+            "started_at": None,
+            "finished_at": None,
+        }
 
         # 检查并创建集合
+        # torch 与 onnx 后端输出相同的 float32 向量，int8 量化模型的向量只能与自身比较，
+        # 集合元数据记录向量空间，与当前后端不一致时删除集合并重建索引
+        self.embedding_space = self._get_embedding_space(DEFAULT_EMBEDDING_MODEL, embedding_backend)
         try:
             self.collection = self.client.get_collection(
                 name="target_docs", embedding_function=self.embedding_function
             )
-            # 检查是否需要增量更新
-            self._check_for_updates()
+            self._collection_created = False
+            # 旧版集合没有记录向量空间，按默认后端处理
+            collection_space = (self.collection.metadata or {}).get(
+                "embedding_space",
+                self._get_embedding_space(DEFAULT_EMBEDDING_MODEL, DEFAULT_EMBEDDING_BACKEND),
+            )
+            if collection_space != self.embedding_space:
+                print(f"Embedding space changed ({collection_space} -> {self.embedding_space}), rebuilding collection")
+                self.client.delete_collection(name="target_docs")
+                raise ValueError("embedding space changed")
         except Exception as e:
             print(f"Collection not found, creating new one: {e}")
             # 集合不存在，需要创建并初始化
             self.collection = self.client.create_collection(
-                name="target_docs", embedding_function=self.embedding_function
+                name="target_docs",
+                embedding_function=self.embedding_function,
+                metadata={"embedding_space": self.embedding_space},
+            )
+            self._collection_created = True
+
+        # 已有索引时立即提供查询，增量更新在后台完成
+        if self.collection.count() > 0:
+            self._index_status["serving"] = True
+            self._index_ready.set()
+
+        if background_index:
+            self.start_indexing()
+        else:
+            self._build_index()
+
+    @staticmethod
+    def _get_embedding_space(model_name: str, backend: str) -> str:
+        """向量空间标识：同一向量空间的向量可以互相比较"""
+        return f"{model_name}:{'int8' if backend == 'onnx-int8' else 'float32'}"
+
+    def start_indexing(self) -> threading.Thread:
+        """在后台线程中构建或增量更新索引，已在构建时返回正在运行的线程
+
+        Returns:
+            索引构建线程
+        """
+        with self._index_lock:
+            if self._index_thread is None or not self._index_thread.is_alive():
+                self._index_thread = threading.Thread(
+                    target=self._build_index, name="target-index-build", daemon=True
+                )
+                self._index_thread.start()
+            return self._index_thread
+
+    def _build_index(self):
+        """构建或增量更新索引，并记录构建状态"""
+        self._index_status.update(
+            state="building",
+            total_chunks=0,
+            indexed_chunks=0,
+            error=None,
+            started_at=datetime.now().isoformat(),
+            finished_at=None,
+        )
+        try:
+            # 标准指标词表规模很小，先于文档向量索引完成，可确定的查询无需等待文档向量化
+            if self.hybrid_search or self.use_embedding_matrix:
+                self._build_metric_index()
+            if self._collection_created:
+                self._initialize_collection()
+                self._collection_created = False
+            else:
+                # 检查是否需要增量更新
+                self._check_for_updates()
+            self._index_status.update(state="ready", serving=True)
+        except Exception as e:
+            print(f"Error building target index: {e}")
+            self._index_status.update(state="failed", error=str(e))
+        finally:
+            self._index_status["finished_at"] = datetime.now().isoformat()
+            # 构建失败时也唤醒等待的查询，由查询根据 serving 判断是否可用
+            self._index_ready.set()
+
+    def _build_metric_index(self):
+        """从文档目录中提取标准指标名称及别名，构建词法索引和向量矩阵"""
+        metrics: Dict[str, List[str]] = {}
+        for filename in sorted(os.listdir(self.docs_dir)):
+            if filename.endswith(".md"):
+                try:
+                    with open(os.path.join(self.docs_dir, filename), "r", encoding="utf-8") as f:
+                        for name, aliases in extract_metric_names(f.read()).items():
+                            metrics.setdefault(name, [])
+                            metrics[name].extend(alias for alias in aliases if alias not in metrics[name])
+                except Exception as e:
+                    print(f"Error processing {filename}: {e}")
+        if self.hybrid_search:
+            self.metric_index = MetricLexicalIndex(metrics)
+            print(f"[指标词法索引] 已加载 {len(metrics)} 个标准指标")
+        if self.use_embedding_matrix:
+            self.metric_matrix = MetricEmbeddingMatrix.load_or_build(
+                metrics,
+                self.embedding_function,
+                os.path.join(self.db_path, "metric_embeddings.npy"),
+                self.embedding_space,
+            )
+
+    def index_status(self) -> Dict[str, Any]:
+        """索引构建状态，可用于健康检查
+
+        Returns:
+            包含构建状态（pending/building/ready/failed）、是否可提供查询、
+            待向量化与已向量化的文档块数量、错误信息和起止时间的字典
+        """
+        status = dict(self._index_status)
+        if status["total_chunks"]:
+            status["progress"] = status["indexed_chunks"] / status["total_chunks"]
+        else:
+            status["progress"] = 1.0 if status["state"] == "ready" else 0.0
+        return status
+
+    async def wait_until_ready_async(self, timeout: Optional[float] = None) -> bool:
+        """等待可以提供查询的索引
+
+        Args:
+            timeout: 最长等待时间（秒），默认使用 index_wait_timeout
+
+        Returns:
+            是否已有可用索引
+        """
+        if not self._index_ready.is_set():
+            await asyncio.to_thread(
+                self._index_ready.wait, self.index_wait_timeout if timeout is None else timeout
             )
-            self._initialize_collection()
+        return self._index_status["serving"]
 
     def _load_metadata(self):
         """加载文档元数据"""
@@ -177,6 +362,9 @@ class TargetExtractor:
                     elif self.doc_metadata[filename]["hash"] != file_hash:
                         # 文件已更新
                         updated_files.append(filename)
+                    elif "id" in self.doc_metadata[filename] or "id_prefix" in self.doc_metadata[filename]:
+                        # 旧版元数据按文件或时间戳生成ID，按更新处理以迁移为按内容哈希的块ID
+                        updated_files.append(filename)
                 except Exception as e:
                     print(f"Error checking file {filename}: {e}")
 
@@ -203,7 +391,10 @@ class TargetExtractor:
         removed_files: List[str],
         current_files: Dict[str, str],
     ):
-        """更新向量库集合
+        """按文档块增量更新向量库集合
+
+        块ID由文件名和块内容哈希组成，内容不变的块保留原有向量，只有内容变化的块需要重新向量化；
+        集合中不再对应任何块的ID（包括旧版按文件或按时间戳生成的ID）统一批量删除。
 
         Args:
             new_files: 新增文件列表
@@ -211,72 +402,99 @@ class TargetExtractor:
             removed_files: 删除文件列表
             current_files: 当前文件哈希值字典
         """
-        # 处理删除的文件
-        if removed_files:
-            ids_to_remove = []
-            for filename in removed_files:
-                if filename in self.doc_metadata:
-                    ids_to_remove.append(self.doc_metadata[filename]["id"])
-                    del self.doc_metadata[filename]
+        # 读取集合中现有的块，按源文件分组
+        existing = self.collection.get(include=["metadatas"])
+        existing_by_source: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for chunk_id, metadata in zip(existing["ids"], existing["metadatas"]):
+            source = (metadata or {}).get("source")
+            existing_by_source.setdefault(source, {})[chunk_id] = metadata or {}
 
-            if ids_to_remove:
-                self.collection.delete(ids=ids_to_remove)
-                print(f"Removed {len(ids_to_remove)} documents from the collection")
+        ids_to_delete: List[str] = []
+        add_ids, add_documents, add_metadatas = [], [], []
+        update_ids, update_metadatas = [], []
 
-        # 处理新增和更新的文件
-        files_to_process = new_files + updated_files
-        if files_to_process:
-            documents = []
-            metadatas = []
-            ids = []
-
-            for filename in files_to_process:
-                file_path = os.path.join(self.docs_dir, filename)
-                try:
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        content = f.read()
-
-                    # 如果是更新的文件，使用原来的ID
-                    if filename in self.doc_metadata:
-                        doc_id = self.doc_metadata[filename]["id"]
-                        # 先删除旧文档
-                        self.collection.delete(ids=[doc_id])
-                    else:
-                        # 新文件生成新ID
-                        doc_id = f"doc_{int(time.time())}_{len(ids)}"
-
-                    # 添加到集合
-                    documents.append(content)
-                    metadatas.append({"source": filename})
-                    ids.append(doc_id)
-
-                    # 更新元数据
-                    self.doc_metadata[filename] = {
-                        "id": doc_id,
-                        "hash": current_files[filename],
-                        "updated_at": datetime.now().isoformat(),
-                    }
-                except Exception as e:
-                    print(f"Error processing {filename}: {e}")
+        # 处理删除的文件
+        for filename in removed_files:
+            ids_to_delete.extend(existing_by_source.get(filename, {}))
+            self.doc_metadata.pop(filename, None)
 
-            # 批量添加到集合
-            if documents:
-                self.collection.add(documents=documents, metadatas=metadatas, ids=ids)
-                print(f"Added/Updated {len(documents)} documents in the collection")
+        # 处理新增和更新的文件
+        for filename in new_files + updated_files:
+            file_path = os.path.join(self.docs_dir, filename)
+            try:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    content = f.read()
+            except Exception as e:
+                print(f"Error processing {filename}: {e}")
+                continue
+
+            chunks = self._split_document(content)
+            old_chunks = existing_by_source.get(filename, {})
+            chunk_ids: List[str] = []
+            for i, chunk in enumerate(chunks):
+                chunk_id = self._get_chunk_id(filename, chunk)
+                if chunk_id in chunk_ids:
+                    # 同一文件中内容完全相同的块只保留一份
+                    continue
+                chunk_ids.append(chunk_id)
+                metadata = {"source": filename, "chunk_index": i, "total_chunks": len(chunks)}
+                if chunk_id not in old_chunks:
+                    add_ids.append(chunk_id)
+                    add_documents.append(chunk)
+                    add_metadatas.append(metadata)
+                elif any(old_chunks[chunk_id].get(key) != value for key, value in metadata.items()):
+                    # 内容未变但位置变化，只更新元数据，不重新向量化
+                    update_ids.append(chunk_id)
+                    update_metadatas.append(metadata)
+            ids_to_delete.extend(chunk_id for chunk_id in old_chunks if chunk_id not in chunk_ids)
+
+            # 更新元数据 - 只保存文件级别的元数据
+            self.doc_metadata[filename] = {
+                "hash": current_files[filename],
+                "updated_at": datetime.now().isoformat(),
+                "chunks": len(chunk_ids),
+            }
+
+        # 分批写入新增的块，先写入再删除，更新期间旧的块仍可被检索到
+        self._index_status.update(total_chunks=len(add_ids), indexed_chunks=0)
+        for start in range(0, len(add_ids), self.index_batch_size):
+            end = start + self.index_batch_size
+            self.collection.add(
+                documents=add_documents[start:end], metadatas=add_metadatas[start:end], ids=add_ids[start:end]
+            )
+            self._index_status["indexed_chunks"] = min(end, len(add_ids))
+        if update_ids:
+            self.collection.update(ids=update_ids, metadatas=update_metadatas)
+        if ids_to_delete:
+            self.collection.delete(ids=ids_to_delete)
+        print(
+            f"Indexed {len(new_files) + len(updated_files)} documents: "
+            f"{len(add_ids)} chunks embedded, {len(update_ids)} chunks moved, {len(ids_to_delete)} chunks removed"
+        )
 
         # 保存元数据
         self._save_metadata()
 
-        # 清除缓存
-        self.query_cache = {}
-        self.cache_timestamps = {}
+        # 文档变化后解析结果可能不同，清除缓存
+        if ids_to_delete or update_ids or add_ids:
+            self.query_cache.clear()
+
+    @staticmethod
+    def _get_chunk_id(filename: str, chunk: str) -> str:
+        """根据文件名和块内容生成块ID，内容不变时ID不变"""
+        return f"{filename}:{hashlib.md5(chunk.encode('utf-8')).hexdigest()}"
 
-    def _split_document(self, content, max_chunk_size=1000):
+    def _split_document(self, content, max_chunk_size=1000, min_chunk_size=50):
         """将文档按空行分割成多个块
 
+        每个段落单独成块，块边界只由段落本身决定，修改一个段落不会移动其他块的边界，
+        增量更新时其他块的内容哈希保持不变。过短的段落（如标题）并入其后的段落，
+        超过最大块大小的段落按行拆分。
+
         Args:
             content: 文档内容
             max_chunk_size: 最大块大小
+            min_chunk_size: 单独成块的最小段落长度
 
         Returns:
             List[str]: 分割后的文档块列表
@@ -287,91 +505,78 @@ class TargetExtractor:
         # 过滤空段落
         paragraphs = [p.strip() for p in paragraphs if p.strip()]
 
-        # 合并小段落，避免过度分割
         chunks = []
-        current_chunk = ""
-
+        prefix = ""
         for para in paragraphs:
-            # 如果当前块加上新段落不超过最大大小，则添加到当前块
-            if len(current_chunk) + len(para) < max_chunk_size:
-                if current_chunk:
-                    current_chunk += "\n\n"
-                current_chunk += para
+            if prefix:
+                para = prefix + "\n\n" + para
+            # 过短的段落并入下一个段落，避免产生没有实际内容的块
+            if len(para) <= min_chunk_size:
+                prefix = para
+                continue
+            prefix = ""
+            if len(para) <= max_chunk_size:
+                chunks.append(para)
             else:
-                # 如果当前块不为空，添加到chunks
-                if current_chunk:
-                    chunks.append(current_chunk)
-                # 开始新块
-                current_chunk = para
+                chunks.extend(self._split_paragraph(para, max_chunk_size))
 
-        # 添加最后一个块
-        if current_chunk:
-            chunks.append(current_chunk)
-
-        # 确保每个块都包含有意义的内容
-        chunks = [chunk for chunk in chunks if len(chunk) > 50]  # 忽略过小的块
+        # 文档末尾的短段落并入最后一个块，整篇文档都很短时单独成块
+        if prefix:
+            if chunks and len(chunks[-1]) + len(prefix) + 2 <= max_chunk_size:
+                chunks[-1] += "\n\n" + prefix
+            else:
+                chunks.append(prefix)
 
         return chunks
 
+    @staticmethod
+    def _split_paragraph(paragraph, max_chunk_size):
+        """按行拆分超过最大块大小的段落，单行过长时按字符截断
+
+        Args:
+            paragraph: 段落内容
+            max_chunk_size: 最大块大小
+
+        Returns:
+            List[str]: 拆分后的块列表
+        """
+        pieces = []
+        current = ""
+        for line in paragraph.split("\n"):
+            while len(line) > max_chunk_size:
+                if current:
+                    pieces.append(current)
+                    current = ""
+                pieces.append(line[:max_chunk_size])
+                line = line[max_chunk_size:]
+            if current and len(current) + len(line) + 1 > max_chunk_size:
+                pieces.append(current)
+                current = ""
+            current = current + "\n" + line if current else line
+        if current.strip():
+            pieces.append(current)
+        return pieces
+
     def _initialize_collection(self):
         """初始化集合，加载文档并向量化"""
-        documents = []
-        metadatas = []
-        ids = []
         current_files = {}
 
         # 遍历文档目录
         for filename in os.listdir(self.docs_dir):
             if filename.endswith(".md"):
-                file_path = os.path.join(self.docs_dir, filename)
                 try:
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        content = f.read()
-
                     # 计算文件的哈希值
-                    file_hash = self._get_file_hash(file_path)
-                    current_files[filename] = file_hash
-
-                    # 分割文档内容
-                    chunks = self._split_document(content)
-
-                    # 为每个块创建ID和元数据
-                    base_time = int(time.time())
-                    for i, chunk in enumerate(chunks):
-                        chunk_id = f"doc_{base_time}_{filename}_{i}"
-                        documents.append(chunk)
-                        metadatas.append(
-                            {
-                                "source": filename,
-                                "chunk_index": i,
-                                "total_chunks": len(chunks),
-                            }
-                        )
-                        ids.append(chunk_id)
-
-                    # 更新元数据 - 只保存文件级别的元数据
-                    self.doc_metadata[filename] = {
-                        "id_prefix": f"doc_{base_time}_{filename}",
-                        "hash": file_hash,
-                        "updated_at": datetime.now().isoformat(),
-                        "chunks": len(chunks),
-                    }
+                    current_files[filename] = self._get_file_hash(os.path.join(self.docs_dir, filename))
                 except Exception as e:
                     print(f"Error processing {filename}: {e}")
 
-        # 批量添加到集合
-        if documents:
-            self.collection.add(documents=documents, metadatas=metadatas, ids=ids)
-            print(
-                f"Added {len(documents)} chunks from {len(self.doc_metadata)} documents to the collection"
-            )
-
-            # 保存元数据
-            self._save_metadata()
+        # 新建的集合为空，所有文档按新增处理；元数据中残留的文件按删除处理
+        removed_files = [filename for filename in self.doc_metadata if filename not in current_files]
+        self._update_collection(list(current_files), [], removed_files, current_files)
 
     async def extract_target_async(
         self, query_text: str, top_k: int = 5, bypass_cache: bool = False
-    ) -> str:
+    ) -> Optional[str]:
         """异步从文本中提取标准指标名称
 
         Args:
@@ -380,39 +585,158 @@ class TargetExtractor:
             bypass_cache: 是否绕过缓存
 
         Returns:
-            str: 提取的标准指标名称
+            Optional[str]: 提取的标准指标名称，大语言模型调用失败时返回 None
         """
-        # 查询规范化（去除多余空格等）
-        normalized_query = " ".join(query_text.split()).lower()
+        results = await self.extract_targets_async([query_text], top_k, bypass_cache)
+        return results[0]
 
-        # 检查缓存
-        current_time = time.time()
-        if not bypass_cache and normalized_query in self.query_cache:
-            cache_time = self.cache_timestamps.get(normalized_query, 0)
-            # 检查缓存是否过期
-            if current_time - cache_time < self.cache_ttl:
-                print(f"Cache hit for query: {normalized_query}")
-                return self.query_cache[normalized_query]
-            else:
-                # 缓存过期，删除
-                del self.query_cache[normalized_query]
-                del self.cache_timestamps[normalized_query]
+    async def extract_targets_async(
+        self,
+        query_texts: List[str],
+        top_k: int = 5,
+        bypass_cache: bool = False,
+        max_concurrency: int = 4,
+    ) -> List[Optional[str]]:
+        """异步批量提取标准指标名称
+
+        规范化后相同的查询只解析一次：先查缓存和词法索引，未命中的查询一次批量向量化，
+        再用一次向量矩阵检索和一次多查询的ChromaDB检索得到候选，剩余的查询以受限并发调用大语言模型。
+        单个查询的大语言模型调用失败时只有该查询返回 None（不写入缓存），不影响同批次的其他查询。
+
+        Args:
+            query_texts: 用户查询文本列表
+            top_k: 检索结果数量
+            bypass_cache: 是否绕过缓存
+            max_concurrency: 大语言模型调用的最大并发数
 
-        # 增加检索数量，因为我们是按块检索的
-        query_results = self.collection.query(
-            query_texts=[normalized_query],
+        Returns:
+            与输入顺序一致的标准指标名称列表，解析失败的查询为 None
+        """
+        # 查询规范化（去除多余空格等），相同的查询只保留第一次出现的原文
+        normalized_queries = [" ".join(query_text.split()).lower() for query_text in query_texts]
+        originals: Dict[str, str] = {}
+        for normalized_query, query_text in zip(normalized_queries, query_texts):
+            originals.setdefault(normalized_query, query_text)
+        resolved: Dict[str, Optional[str]] = {}
+
+        def resolve(normalized_query: str, target_name: str, source: str):
+            print(f"{source} for query: {normalized_query} -> {target_name}")
+            resolved[normalized_query] = target_name
+            self.query_cache.set(normalized_query, target_name)
+
+        # 检查缓存
+        pending = list(originals)
+        if not bypass_cache:
+            for normalized_query in pending:
+                cached = self.query_cache.get(normalized_query)
+                if cached is not None:
+                    print(f"Cache hit for query: {normalized_query}")
+                    resolved[normalized_query] = cached
+            pending = [query for query in pending if query not in resolved]
+
+        # 词法匹配无歧义时直接返回，无需向量检索和大语言模型
+        rankings: Dict[str, List[List[str]]] = {query: [] for query in pending}
+        metric_index = self.metric_index if self.hybrid_search else None
+        if metric_index is not None and len(metric_index):
+            for normalized_query in pending:
+                matched = metric_index.match(normalized_query, self.lexical_threshold)
+                if matched is not None:
+                    resolve(normalized_query, matched, "Lexical match")
+                else:
+                    rankings[normalized_query].append(
+                        [name for name, _ in metric_index.search(normalized_query, top_k * 2)]
+                    )
+            pending = [query for query in pending if query not in resolved]
+        if not pending:
+            return [resolved[query] for query in normalized_queries]
+
+        # 未命中的查询一次批量向量化，向量矩阵检索和ChromaDB检索共用
+        query_vectors = await self.embedding_executor.embed_async(pending)
+
+        # 标准指标名称向量矩阵检索，第一名明显领先时直接返回
+        metric_matrix = self.metric_matrix
+        if metric_matrix is not None and len(metric_matrix):
+            for normalized_query, ranked in zip(pending, metric_matrix.search(query_vectors, max(top_k, 2))):
+                confident = MetricEmbeddingMatrix.is_confident(
+                    ranked, self.embedding_margin, self.embedding_min_score
+                )
+                if confident is not None:
+                    resolve(normalized_query, confident, "Embedding match")
+                else:
+                    rankings[normalized_query].append([name for name, _ in ranked])
+            remaining = [i for i, query in enumerate(pending) if query not in resolved]
+            pending = [pending[i] for i in remaining]
+            query_vectors = [query_vectors[i] for i in remaining]
+        if not pending:
+            return [resolved[query] for query in normalized_queries]
+
+        # 尚无可用索引时等待后台构建完成
+        if not await self.wait_until_ready_async():
+            raise RuntimeError(f"标准指标索引尚未就绪: {self.index_status()}")
+
+        # 一次多查询检索，增加检索数量，因为我们是按块检索的
+        query_results = await asyncio.to_thread(
+            self.collection.query,
+            query_embeddings=[[float(value) for value in vector] for vector in query_vectors],
             n_results=top_k * 2,  # 增加检索数量，确保有足够的上下文
             include=["metadatas", "documents"],
         )
 
+        # 剩余的查询以受限并发调用大语言模型
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def select_target(index: int, normalized_query: str):
+            documents = query_results["documents"][index] if query_results["documents"] else []
+            metadatas = query_results["metadatas"][index] if query_results["metadatas"] else []
+            try:
+                async with semaphore:
+                    target_name = await self._select_target_async(
+                        originals[normalized_query], documents, metadatas, rankings[normalized_query], top_k
+                    )
+            except Exception as e:
+                print(f"Error extracting target for {originals[normalized_query]!r}: {e}")
+                resolved[normalized_query] = None
+                return
+            resolved[normalized_query] = target_name
+            # 更新缓存
+            self.query_cache.set(normalized_query, target_name)
+
+        await asyncio.gather(*(select_target(i, query) for i, query in enumerate(pending)))
+        return [resolved[query] for query in normalized_queries]
+
+    async def _select_target_async(
+        self,
+        query_text: str,
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+        rankings: List[List[str]],
+        top_k: int,
+    ) -> str:
+        """根据检索结果调用大语言模型选择标准指标名称
+
+        Args:
+            query_text: 用户查询文本
+            documents: ChromaDB检索到的文档块
+            metadatas: 文档块元数据
+            rankings: 词法、向量矩阵检索得到的候选排名
+            top_k: 候选标准指标数量
+
+        Returns:
+            标准指标名称
+        """
         # 构建上下文，按文档源分组并重新组织
         context = ""
-        if query_results and query_results["documents"]:
+        vector_ranking: List[str] = []
+        if documents:
+            # 按检索顺序收集文档块中出现的标准指标名称，用于与词法检索结果融合
+            for doc in documents:
+                vector_ranking.extend(
+                    name for name in extract_metric_names(doc) if name not in vector_ranking
+                )
+
             # 按源文件分组
             docs_by_source = {}
-            for i, (doc, metadata) in enumerate(
-                zip(query_results["documents"][0], query_results["metadatas"][0])
-            ):
+            for doc, metadata in zip(documents, metadatas):
                 source = metadata["source"]
                 if source not in docs_by_source:
                     docs_by_source[source] = []
@@ -432,8 +756,14 @@ class TargetExtractor:
                     context = context[:4000] + "...(内容已截断)"
                     break
 
+        # 词法、向量矩阵与文档向量检索结果按倒数排名融合，作为候选标准指标
+        candidates = ""
+        if any(rankings) or vector_ranking:
+            fused = reciprocal_rank_fusion([*rankings, vector_ranking])[:top_k]
+            candidates = "候选标准指标（按相关度排序）：" + "、".join(name for name, _ in fused) + "\n\n"
+
         # 构建提示词
-        prompt = f"""检索到的上下文是：
+        prompt = f"""{candidates}检索到的上下文是：
 {context}
 
 ## 角色
@@ -449,60 +779,20 @@ class TargetExtractor:
 用户输入: "{query_text}"
 """
 
-        # 检查配置是否启用流式模式
-        use_stream_mode = self.llm_config.get("use_stream_mode", True)  # 默认启用流式模式
-        print_stream_output = self.llm_config.get("print_stream_output", False)  # 默认不打印
-
-        if use_stream_mode:
-            # 使用流式模式
-            print("[指标提取] 使用流式模式...")
-
-            # 准备流式输出生成器
-            stream_generator = self.target_agent.run_stream(task=prompt)
-
-            # 使用 Console 类处理流式输出并获取结果
-            if print_stream_output:
-                print("[指标提取] 流式输出开始:")
-                result = await Console(stream_generator, output_stats=True)
-            else:
-                result = await Console(stream_generator, output_stats=False)
-        else:
-            # 使用非流式模式
-            print("[指标提取] 使用非流式模式...")
-            result = await self.target_agent.run(task=prompt)
-
-        # 从结果中获取最后一条消息的内容
-        response = result.messages[-1].content
-
-        # 清理响应，确保只返回标准指标名称
-        response = response.strip()
+        # 执行器返回去除首尾空白的标准指标名称
+        return await self.target_executor.complete(prompt)
 
-        # 更新缓存
-        self._update_cache(normalized_query, response)
+    def cache_stats(self) -> Dict[str, Any]:
+        """查询缓存统计信息
 
-        return response
-
-    def _update_cache(self, query: str, response: str):
-        """更新查询缓存
-
-        Args:
-            query: 规范化后的查询文本
-            response: 响应结果
+        Returns:
+            包含命中、未命中、淘汰、过期次数和命中率的字典
         """
-        # 检查缓存大小，如果超过限制，删除最早的条目
-        if len(self.query_cache) >= self.cache_size:
-            # 找到最早的缓存项
-            oldest_query = min(self.cache_timestamps.items(), key=lambda x: x[1])[0]
-            del self.query_cache[oldest_query]
-            del self.cache_timestamps[oldest_query]
-
-        # 添加新缓存
-        self.query_cache[query] = response
-        self.cache_timestamps[query] = time.time()
+        return self.query_cache.stats()
 
     def extract_target(
         self, query_text: str, top_k: int = 3, bypass_cache: bool = False
-    ) -> str:
+    ) -> Optional[str]:
         """同步从文本中提取标准指标名称（兼容旧版接口）
 
         Args:
@@ -511,7 +801,44 @@ class TargetExtractor:
             bypass_cache: 是否绕过缓存
 
         Returns:
-            str: 提取的标准指标名称
+            Optional[str]: 提取的标准指标名称，大语言模型调用失败时返回 None
         """
         # 使用事件循环运行异步方法
-        return asyncio.run(self.extract_target_async(query_text, top_k, bypass_cache))
+        return run_sync(self.extract_target_async(query_text, top_k, bypass_cache))
+
+
+# 进程级标准指标名称解析器注册表
+_target_extractors: Dict[str, TargetExtractor] = {}
+_target_extractors_lock = threading.Lock()
+
+
+def get_target_extractor(
+    llm_config: Dict[str, Any], docs_dir: str, db_path: str = "./chroma_db", **kwargs: Any
+) -> TargetExtractor:
+    """获取进程内共享的标准指标名称解析器
+
+    相同文档目录、数据库路径和模型配置的解析器只创建一次，避免每个 BIAgent
+    重复加载向量模型、打开ChromaDB并计算文档哈希。
+
+    Args:
+        llm_config: 语言模型配置
+        docs_dir: 文档目录路径
+        db_path: ChromaDB数据库路径
+        **kwargs: 传递给 TargetExtractor 的其他参数
+
+    Returns:
+        共享的标准指标名称解析器
+    """
+    model_keys = ("model", "api_key", "base_url", "temperature", "model_info",
+                  "use_stream_mode", "print_stream_output")
+    key = json.dumps(
+        [os.path.abspath(docs_dir), os.path.abspath(db_path),
+         {k: llm_config.get(k) for k in model_keys}, kwargs],
+        sort_keys=True, default=str,
+    )
+    with _target_extractors_lock:
+        extractor = _target_extractors.get(key)
+        if extractor is None:
+            extractor = TargetExtractor(llm_config=llm_config, docs_dir=docs_dir, db_path=db_path, **kwargs)
+            _target_extractors[key] = extractor
+        return extractor
@@ -0,0 +1,227 @@
+"""
+LRU+TTL 缓存模块
+提供 O(1) 淘汰、逐条过期、可选 SQLite 持久化的进程级共享缓存
+"""
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class LRUTTLCache:
+    """LRU+TTL 缓存
+
+    基于 OrderedDict 实现，读写和淘汰均为 O(1)，每个条目单独记录过期时间。
+    指定持久化路径时，写入和删除先记录在内存中，由后台线程每隔 flush_interval 秒合并写入 SQLite 文件
+    （同一键的多次变更只写最后一次，一批变更一次提交），读写路径不产生磁盘 I/O，可在事件循环中直接调用；
+    进程退出时写入剩余的变更。进程重启后加载未过期的条目，并按写入时间恢复 LRU 顺序（命中不写盘）。
+    缓存值需要可以序列化为 JSON。
+    """
+
+    def __init__(
+        self,
+        max_size: int = 100,
+        ttl: int = 3600,
+        persist_path: Optional[str] = None,
+        flush_interval: float = 1.0,
+    ):
+        """初始化缓存
+
+        Args:
+            max_size: 最大条目数
+            ttl: 默认存活时间（秒）
+            persist_path: SQLite 持久化文件路径，为 None 时只保存在内存中
+            flush_interval: 后台线程写入持久化文件的间隔（秒）
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.persist_path = persist_path
+        self.flush_interval = flush_interval
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # 待写入的变更：键到 (值, 过期时间, 写入时间) 的映射，None 表示删除
+        self._pending: Dict[str, Optional[Tuple[Any, float, float]]] = {}
+        self._pending_clear = False
+        self._store_lock = threading.Lock()
+        self._flush_event = threading.Event()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if persist_path:
+            self._open_store(persist_path)
+            threading.Thread(target=self._flush_loop, name="cache-flush", daemon=True).start()
+            atexit.register(self.flush)
+
+    def _open_store(self, persist_path: str) -> None:
+        """打开 SQLite 持久化文件并加载未过期的条目"""
+        os.makedirs(os.path.dirname(os.path.abspath(persist_path)), exist_ok=True)
+        self._conn = sqlite3.connect(persist_path, check_same_thread=False)
+        # 缓存丢失最近几次写入可以接受，WAL 加 NORMAL 同步级别避免每次提交都等待 fsync
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        now = time.time()
+        self._conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (now,))
+        rows = self._conn.execute(
+            "SELECT key, value, expires_at FROM cache_entries ORDER BY last_used DESC LIMIT ?",
+            (self.max_size,),
+        ).fetchall()
+        # 按最近使用时间从旧到新插入，保持 LRU 顺序
+        for key, value, expires_at in reversed(rows):
+            self._entries[key] = (json.loads(value), expires_at)
+        self._conn.commit()
+
+    def _persist_set(self, key: str, value: Any, expires_at: float) -> None:
+        if self._conn is not None:
+            self._pending[key] = (value, expires_at, time.time())
+
+    def _persist_delete(self, key: str) -> None:
+        if self._conn is not None:
+            self._pending[key] = None
+
+    def _flush_loop(self) -> None:
+        """后台写入线程：定期或在 clear 后将待写入的变更写入持久化文件"""
+        while True:
+            self._flush_event.wait(self.flush_interval)
+            self._flush_event.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing cache to {self.persist_path}: {e}")
+
+    def flush(self) -> None:
+        """将待写入的变更批量写入持久化文件"""
+        if self._conn is None:
+            return
+        with self._store_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                pending_clear, self._pending_clear = self._pending_clear, False
+            if not pending and not pending_clear:
+                return
+            if pending_clear:
+                self._conn.execute("DELETE FROM cache_entries")
+            upserts = [
+                (key, json.dumps(entry[0], ensure_ascii=False), entry[1], entry[2])
+                for key, entry in pending.items()
+                if entry is not None
+            ]
+            deletes = [(key,) for key, entry in pending.items() if entry is None]
+            if deletes:
+                self._conn.executemany("DELETE FROM cache_entries WHERE key = ?", deletes)
+            if upserts:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO cache_entries (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                    upserts,
+                )
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存，未命中或已过期时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self._persist_delete(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        """写入缓存，超过容量时淘汰最近最少使用的条目
+
+        Args:
+            key: 缓存键
+            value: 缓存值
+            ttl: 本条目的存活时间（秒），默认使用缓存的存活时间
+        """
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            self._persist_set(key, value, expires_at)
+            while len(self._entries) > self.max_size:
+                evicted_key, _ = self._entries.popitem(last=False)
+                self._persist_delete(evicted_key)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        """删除缓存条目"""
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._persist_delete(key)
+
+    def clear(self) -> None:
+        """清空缓存（包括持久化文件中的条目）"""
+        with self._lock:
+            self._entries.clear()
+            if self._conn is not None:
+                self._pending.clear()
+                self._pending_clear = True
+                self._flush_event.set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息
+
+        Returns:
+            包含命中、未命中、淘汰、过期次数，命中率和当前条目数的字典
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._entries),
+        }
+
+
+# 进程级共享缓存，按名称区分
+_shared_caches: Dict[str, LRUTTLCache] = {}
+_shared_caches_lock = threading.Lock()
+
+
+def get_shared_cache(
+    name: str, max_size: int = 100, ttl: int = 3600, persist_path: Optional[str] = None
+) -> LRUTTLCache:
+    """获取进程级共享缓存，同名缓存首次获取时按参数创建
+
+    Args:
+        name: 缓存名称
+        max_size: 最大条目数
+        ttl: 默认存活时间（秒）
+        persist_path: SQLite 持久化文件路径
+
+    Returns:
+        共享缓存实例
+    """
+    with _shared_caches_lock:
+        cache = _shared_caches.get(name)
+        if cache is None:
+            cache = LRUTTLCache(max_size=max_size, ttl=ttl, persist_path=persist_path)
+            _shared_caches[name] = cache
+        return cache
+
+
+__all__ = ["LRUTTLCache", "get_shared_cache"]